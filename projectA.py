@@ -5,9 +5,14 @@ Project A Template
 
 
 """
+import heapq
+import itertools
+import json
 import math
+import os
+import sys
 
-from simVis1 import visualize
+import numpy as np
 
 
 
@@ -24,6 +29,8 @@ def main():
     
 
     # Default is Ax1xmin= 0,Ax1xmax = 1, Ax1ymin = 0, Ax1ymax = 1
+    # simVis1 needs a display, so it is only imported when drawing
+    from simVis1 import visualize
     vis = visualize() 
     
 
@@ -89,19 +96,38 @@ def boundary_locations(vis,radius):
     
 
 
-def updateX(x,vx,dt):
+# Precision modes: 'legacy-3dp' rounds to 3 decimal places after each
+# operation, as the original project did; 'full' keeps float64 throughout
+PRECISION_MODES = ('legacy-3dp', 'full')
+
+def roundTo(value,precision):
+    
+    # round(value, 3) in legacy mode, the value unchanged in full mode
+    
+    if precision == 'full':
+        return value
+    return round(value,3)
+
+def checkPrecision(precision):
+    
+    # Rejects anything that is not a known precision mode
+    
+    if precision not in PRECISION_MODES:
+        raise ValueError(f"unknown precision mode {precision!r}, expected one of {PRECISION_MODES}")
+
+def updateX(x,vx,dt,precision='legacy-3dp'):
     
     # updates x element of circle's position on x,y plane
     
     x = x + vx * dt
-    return round(x,3)
+    return roundTo(x,precision)
 
-def updateY(y,vy,dt):
+def updateY(y,vy,dt,precision='legacy-3dp'):
     
     # updates y element of circle's position on x,y plane
     
    y = y + vy * dt
-   return round(y,3)
+   return roundTo(y,precision)
 
 def boxCollision(x,y,vx,vy,xLow,xHigh,yLow,yHigh):
     
@@ -128,42 +154,44 @@ def boxCollision(x,y,vx,vy,xLow,xHigh,yLow,yHigh):
     
     return x,y,vx,vy
 
-def Overlap(x1,y1,radius1,x2,y2,radius2):
+def Overlap(x1,y1,radius1,x2,y2,radius2,precision='legacy-3dp'):
     
     # Determines if the circles are overlapping using the distance bewteen
     # their centers and each circle's radius
     
-    distance = get_distance(x1, y1, x2, y2)
+    distance = get_distance(x1, y1, x2, y2, precision)
     
-    radius_sum = round(radius1 + radius2,3)
+    radius_sum = roundTo(radius1 + radius2,precision)
     
     if distance < radius_sum:
         return True
     else:
         return False
 
-def get_unit_direction(x1,y1,x2,y2):
+def get_unit_direction(x1,y1,x2,y2,precision='legacy-3dp'):
     
     # Determines the a unit vector in the direction from one circle's radius
     # to another
     
-    if get_distance(x1, y1, x2, y2) == 0:
+    distance = get_distance(x1, y1, x2, y2, precision)
+    
+    if distance == 0:
         return (math.nan, math.nan)
     
     else:
-        x_unit = (x1 - x2) / get_distance(x1, y1, x2, y2)
-        y_unit = (y1 - y2) / get_distance(x1, y1, x2, y2)
+        x_unit = (x1 - x2) / distance
+        y_unit = (y1 - y2) / distance
         
         unit_direction = (x_unit, y_unit)
         return unit_direction
 
-def get_distance(x1,y1,x2,y2):
+def get_distance(x1,y1,x2,y2,precision='legacy-3dp'):
     
     # Calculates the distance between the two circles' centers using the
     # distance formula
     
     distance = ((x1 - x2) ** 2 + (y1 - y2) ** 2) ** (1/2)
-    return round(distance,3)
+    return roundTo(distance,precision)
     
 def dot_product(x1,y1,x2,y2):
     
@@ -172,14 +200,16 @@ def dot_product(x1,y1,x2,y2):
     result = x1 * x2 + y1 * y2
     return result
 
-def update_collision_velocity(x1,y1,v1x,v1y, x2,y2,v2x,v2y):
+def update_collision_velocity(x1,y1,v1x,v1y, x2,y2,v2x,v2y,precision='legacy-3dp'):
     
     # Checks if cirlces are fully overlapped, in which case their velocities are 
     # flipped in both cases
     # In other cases, calculates the new velocites after a collision between
     # circles
     
-    if get_distance(x1, y1, x2, y2) == 0:
+    distance = get_distance(x1, y1, x2, y2, precision)
+    
+    if distance == 0:
         
         v1x = -v1x
         v1y = -v1y
@@ -189,14 +219,14 @@ def update_collision_velocity(x1,y1,v1x,v1y, x2,y2,v2x,v2y):
         return v1x, v1y, v2x, v2y
         
     else:
-        new_v1x = round(v1x - (dot_product(v1x - v2x, v1y - v2y, x1 - x2, y1 - y2) / \
-                 ((get_distance(x1, y1, x2, y2)) ** 2)) * (x1 - x2), 3)
-        new_v1y = round(v1y - (dot_product(v1x - v2x, v1y - v2y, x1 - x2, y1 - y2) / \
-                 ((get_distance(x1, y1, x2, y2)) ** 2)) * (y1 - y2), 3)
-        new_v2x = round(v2x - (dot_product(v2x - v1x, v2y - v1y, x2 - x1, y2 - y1) / \
-                 ((get_distance(x1, y1, x2, y2)) ** 2)) * (x2 - x1), 3)
-        new_v2y = round(v2y - (dot_product(v2x - v1x, v2y - v1y, x2 - x1, y2 - y1) / \
-                 ((get_distance(x1, y1, x2, y2)) ** 2)) * (y2 - y1), 3)
+        # the distance and both projections are shared by all four components
+        scale1 = dot_product(v1x - v2x, v1y - v2y, x1 - x2, y1 - y2) / (distance ** 2)
+        scale2 = dot_product(v2x - v1x, v2y - v1y, x2 - x1, y2 - y1) / (distance ** 2)
+        
+        new_v1x = roundTo(v1x - scale1 * (x1 - x2), precision)
+        new_v1y = roundTo(v1y - scale1 * (y1 - y2), precision)
+        new_v2x = roundTo(v2x - scale2 * (x2 - x1), precision)
+        new_v2y = roundTo(v2y - scale2 * (y2 - y1), precision)
         return new_v1x, new_v1y, new_v2x, new_v2y
         
 
@@ -204,41 +234,1092 @@ def update_collision_velocity(x1,y1,v1x,v1y, x2,y2,v2x,v2y):
     
     
 
-def circleCollision(x1,y1,radius1,v1x, v1y, x2,y2,radius2,v2x,v2y):
+def circleCollision(x1,y1,radius1,v1x, v1y, x2,y2,radius2,v2x,v2y,precision='legacy-3dp'):
     
     # Checks if circles are touching each other first
     # If so, calls update_collision_velocity to find new velocities
     # Updates new x and y positions for first circle
     
-    if Overlap(x1, y1, radius1, x2, y2, radius2):
-        v1x, v1y, v2x, v2y = update_collision_velocity(x1, y1, v1x, v1y, x2, y2, v2x, v2y)
+    if Overlap(x1, y1, radius1, x2, y2, radius2, precision):
+        v1x, v1y, v2x, v2y = update_collision_velocity(x1, y1, v1x, v1y, x2, y2, v2x, v2y, precision)
     
-        distance = get_distance(x1, y1, x2, y2)
+        distance = get_distance(x1, y1, x2, y2, precision)
         
-        x_unit, y_unit = get_unit_direction(x1, y1, x2, y2)
+        x_unit, y_unit = get_unit_direction(x1, y1, x2, y2, precision)
         
         if (x_unit, y_unit) == (math.nan, math.nan):
             x_unit, y_unit = 0.707, 0.707
         
-        displacement = round(radius1 + radius2 - distance,3)
+        displacement = roundTo(radius1 + radius2 - distance,precision)
         
-        x1 = round((x1 + x_unit * displacement),3)
-        y1 = round((y1 + y_unit * displacement),3)
+        x1 = roundTo((x1 + x_unit * displacement),precision)
+        y1 = roundTo((y1 + y_unit * displacement),precision)
         
     return x1, y1, v1x, v1y, x2, y2, v2x, v2y
 
-# DON NOT CHANGE THIS FUNCTION
-def simulate(simSteps,vis,x1,y1,x2,y2,v1x,v1y,v2x,v2y,dt,radius):
+def roundArray(values, digits=3):
+    
+    # Vectorised round(value, digits) for a NumPy array
+    # np.round scales by 10**digits and rounds half to even, which can pick a
+    # different neighbour than the builtin round for values that sit on a
+    # halfway point, so those few are settled one at a time with round()
+    
+    scale = 10.0 ** digits
+    scaled = values * scale
+    rounded = np.round(values, digits)
+    
+    halfway = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for k in np.flatnonzero(halfway):
+        rounded.flat[k] = round(float(values.flat[k]), digits)
+    
+    return rounded
+
+def boxCollisionArrays(x,y,vx,vy,xLow,xHigh,yLow,yHigh):
+    
+    # Whole-array version of boxCollision
+    # Reverses the velocity of every particle past a wall and moves it back
+    # onto that wall; the bounds may be scalars or per-particle arrays
+    
+    hitX = (x < xLow) | (x > xHigh)
+    vx = np.where(hitX, -vx, vx)
+    x = np.clip(x, xLow, xHigh)
+    
+    hitY = (y < yLow) | (y > yHigh)
+    vy = np.where(hitY, -vy, vy)
+    y = np.clip(y, yLow, yHigh)
+    
+    return x,y,vx,vy
+
+
+# Cells whose pairs are tested against a cell: itself and the half of its
+# neighbours that lie after it, so each pair of cells is visited once
+NEIGHBOUR_OFFSETS = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+
+# Below this many circles the grid broad phase falls back to every pair
+GRID_MIN_PARTICLES = 32
+
+class SpatialHash:
     
     """
-    Run a particle simulation for a specified number of time steps.
+    Uniform-grid spatial hash of circle centres.
+
+    Every circle is binned into a square cell of side ``cellSize``. When the
+    cell side is at least the largest circle diameter, two circles can only
+    overlap if their cells touch, so only circles in the same or a
+    neighbouring cell need to be tested against each other.
+
+    Parameters
+    ----------
+    x, y : ndarray
+        Coordinates of the circle centres.
+    cellSize : float
+        Side length of a grid cell.
+
+    """
+    
+    def __init__(self, x, y, cellSize):
+        
+        self.cellSize = cellSize
+        self.n = len(x)
+        if self.n == 0:
+            self.order = np.zeros(0, dtype=np.int64)
+            self.sortedKeys = self.order
+            return
+        
+        # integer cell coordinates, shifted to start at zero
+        cx = np.floor(x / cellSize).astype(np.int64)
+        cy = np.floor(y / cellSize).astype(np.int64)
+        self.cxMin = int(cx.min())
+        self.cyMin = int(cy.min())
+        cx -= self.cxMin
+        cy -= self.cyMin
+        self.cxMax = int(cx.max())
+        self.cyMax = int(cy.max())
+        
+        # one key per cell; the spare column keeps the cy - 1 neighbour of the
+        # bottom row from wrapping onto a real cell
+        self.columns = self.cyMax + 2
+        keys = cx * self.columns + cy
+        
+        self.order = np.argsort(keys, kind='stable')
+        self.sortedKeys = keys[self.order]
+    
+    def pairs(self):
+        
+        """
+        Every pair of circles in the same or neighbouring cells.
+
+        Binning and pairing are whole-array operations, so the cost grows
+        with the number of circles plus the number of candidates rather than
+        with the number of all pairs.
+
+        Returns
+        -------
+        first, second : ndarray of int
+            Indices of the candidate pairs, with first < second, sorted by
+            first and then by second.
+
+        """
+        
+        n = self.n
+        empty = np.zeros(0, dtype=np.int64)
+        if n < 2:
+            return empty, empty
+        
+        order = self.order
+        sortedKeys = self.sortedKeys
+        columns = self.columns
+        positions = np.arange(n)
+        
+        first = []
+        second = []
+        for dx, dy in NEIGHBOUR_OFFSETS:
+            target = sortedKeys + dx * columns + dy
+            start = np.searchsorted(sortedKeys, target, side='left')
+            end = np.searchsorted(sortedKeys, target, side='right')
+            if dx == 0 and dy == 0:
+                # same cell: only the circles sorted after this one
+                start = positions + 1
+            
+            counts = np.maximum(end - start, 0)
+            total = counts.sum()
+            if total == 0:
+                continue
+            
+            # expand each [start, end) range into explicit partner positions
+            owner = np.repeat(positions, counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            partner = np.repeat(start, counts) + offsets
+            
+            first.append(order[owner])
+            second.append(order[partner])
+        
+        if not first:
+            return empty, empty
+        
+        a = np.concatenate(first)
+        b = np.concatenate(second)
+        low = np.minimum(a, b)
+        high = np.maximum(a, b)
+        
+        # index order, the order allPairs gives them in
+        ordering = np.lexsort((high, low))
+        return low[ordering], high[ordering]
+    
+    def near(self, px, py):
+        
+        # Indices of the binned circles in the cell holding point (px, py)
+        # and the eight cells around it, in increasing order
+        
+        if self.n == 0:
+            return []
+        cx = math.floor(px / self.cellSize) - self.cxMin
+        cy = math.floor(py / self.cellSize) - self.cyMin
+        
+        found = []
+        for gx in range(max(cx - 1, 0), min(cx + 1, self.cxMax) + 1):
+            low = max(cy - 1, 0)
+            high = min(cy + 1, self.cyMax)
+            if low > high:
+                continue
+            # the cells of one column are consecutive keys
+            start = np.searchsorted(self.sortedKeys, gx * self.columns + low, side='left')
+            end = np.searchsorted(self.sortedKeys, gx * self.columns + high, side='right')
+            found.extend(self.order[start:end].tolist())
+        return sorted(found)
+
+def spatialHashPairs(x,y,cellSize):
+    
+    """
+    Find candidate pairs of circles with a uniform-grid spatial hash.
+
+    See SpatialHash.pairs.
+
+    Returns
+    -------
+    first, second : ndarray of int
+        Indices of the candidate pairs, with first < second, sorted by first
+        and then by second.
+
+    """
+    
+    return SpatialHash(x, y, cellSize).pairs()
+
+def allPairs(n):
+    
+    # Every pair of n circles, for comparison with the spatial hash
+    
+    first, second = np.triu_indices(n, k=1)
+    return first.astype(np.int64), second.astype(np.int64)
+
+def drawCircles(vis,x,y,radius):
+    
+    # Draws circle k of the arrays with colour index k
+    
+    for k in range(len(x)):
+        vis.circle(float(x[k]), float(y[k]), float(radius[k]), k)
+
+
+class ParticleSystem:
+    
+    """
+    A set of circles moving inside a box, stored as NumPy arrays.
+
+    Parameters
+    ----------
+    x, y : array_like
+        Initial coordinates of the circle centres.
+    vx, vy : array_like
+        Initial velocity components of the circles.
+    radius : float or array_like
+        Radius of every circle, or one radius per circle.
+    box : tuple of float, optional
+        Window limits (xmin, xmax, ymin, ymax) of the containing box.
+        Defaults to the visualization window (0, 1, 0, 1).
+    broadPhase : {'grid', 'all'}, optional
+        How candidate pairs for circle collisions are found: a spatial hash
+        with cells one circle diameter wide, or every pair of circles.
+    precision : {'legacy-3dp', 'full'}, optional
+        Whether positions and velocities are rounded to 3 decimal places
+        after each operation, as the original functions do, or kept at full
+        float64 precision.
+
+    """
+    
+    def __init__(self, x, y, vx, vy, radius, box=(0, 1, 0, 1), broadPhase='grid', precision='legacy-3dp'):
+        self.x = np.array(x, dtype=float)
+        self.y = np.array(y, dtype=float)
+        self.vx = np.array(vx, dtype=float)
+        self.vy = np.array(vy, dtype=float)
+        self.radius = np.broadcast_to(np.asarray(radius, dtype=float), self.x.shape).copy()
+        self.box = tuple(box)
+        self.stepCount = 0
+        
+        # random generator used to build or drive the system, if any
+        self.rng = None
+        
+        if broadPhase not in ('grid', 'all'):
+            raise ValueError(f"unknown broad phase {broadPhase!r}")
+        self.broadPhase = broadPhase
+        
+        checkPrecision(precision)
+        self.precision = precision
+        
+        # number of candidate pairs handed to the narrow phase, last step
+        # and in total, to see how well the broad phase prunes
+        self.candidatePairs = 0
+        self.totalCandidatePairs = 0
+        
+        # wall bounces and circle-circle collisions so far
+        self.wallHits = 0
+        self.pairHits = 0
+        
+        # Same adjustment as boundary_locations, one threshold per circle
+        xmin, xmax, ymin, ymax = self.box
+        self.xLow = xmin + self.radius
+        self.xHigh = xmax - self.radius
+        self.yLow = ymin + self.radius
+        self.yHigh = ymax - self.radius
+    
+    def __len__(self):
+        return len(self.x)
+    
+    def integrate(self, dt):
+        
+        # updateX/updateY for every circle at once
+        
+        self.x = self.x + self.vx * dt
+        self.y = self.y + self.vy * dt
+        
+        if self.precision == 'legacy-3dp':
+            self.x = roundArray(self.x)
+            self.y = roundArray(self.y)
+    
+    def wallCollisions(self):
+        
+        # boxCollision for every circle at once
+        
+        self.wallHits += int(np.count_nonzero((self.x < self.xLow) | (self.x > self.xHigh)))
+        self.wallHits += int(np.count_nonzero((self.y < self.yLow) | (self.y > self.yHigh)))
+        
+        self.x, self.y, self.vx, self.vy = boxCollisionArrays(
+            self.x, self.y, self.vx, self.vy,
+            self.xLow, self.xHigh, self.yLow, self.yHigh)
+    
+    def candidates(self):
+        
+        # Candidate pairs from the selected broad phase
+        
+        if self.usesAllPairs():
+            return allPairs(len(self))
+        
+        return self.spatialHash().pairs()
+    
+    def usesAllPairs(self):
+        
+        # binning costs more than it saves for a handful of circles
+        return self.broadPhase == 'all' or len(self) < GRID_MIN_PARTICLES
+    
+    def spatialHash(self):
+        
+        # Grid of the current positions, with cells one diameter wide so
+        # overlapping circles share or touch a cell; legacy rounding can call
+        # circles up to half a thousandth apart overlapping, so the cells
+        # get that much more
+        
+        cellSize = 2 * float(self.radius.max())
+        if self.precision == 'legacy-3dp':
+            cellSize += 1e-3
+        return SpatialHash(self.x, self.y, cellSize)
+    
+    def pairCollisions(self):
+        
+        # Runs circleCollision on every candidate pair, in index order
+        #
+        # circleCollision moves the first circle of a pair out of contact,
+        # which can push it against a circle outside its candidate list. A
+        # full scan would then test that pair, so after circle i moves its
+        # remaining partners are looked up again around its new position.
+        # Only circle i moves while pairs (i, j) run and every j > i is still
+        # where the grid was built, so the grid stays valid for the lookup.
+        
+        if self.usesAllPairs():
+            first, second = allPairs(len(self))
+            grid = None
+        else:
+            grid = self.spatialHash()
+            first, second = grid.pairs()
+        
+        pairs = list(zip(first.tolist(), second.tolist()))
+        k = 0
+        while k < len(pairs):
+            i, j = pairs[k]
+            k += 1
+            if self.collidePair(i, j) and grid is not None:
+                end = k
+                while end < len(pairs) and pairs[end][0] == i:
+                    end += 1
+                partners = grid.near(float(self.x[i]), float(self.y[i]))
+                pairs[k:end] = [(i, p) for p in partners if p > j]
+        
+        self.candidatePairs = len(pairs)
+        self.totalCandidatePairs += len(pairs)
+    
+    def collidePair(self, i, j):
+        
+        # Applies circleCollision to circles i and j and stores the result
+        # Returns True if circle i was moved
+        
+        before = (float(self.x[i]), float(self.y[i]), float(self.vx[i]), float(self.vy[i]),
+                  float(self.x[j]), float(self.y[j]), float(self.vx[j]), float(self.vy[j]))
+        x1,y1,v1x,v1y, x2,y2,v2x,v2y = circleCollision(
+            before[0], before[1], float(self.radius[i]), before[2], before[3],
+            before[4], before[5], float(self.radius[j]), before[6], before[7],
+            self.precision)
+        
+        # circleCollision leaves both circles as they were unless they touch
+        if (x1,y1,v1x,v1y, x2,y2,v2x,v2y) != before:
+            self.pairHits += 1
+        
+        self.x[i], self.y[i], self.vx[i], self.vy[i] = x1, y1, v1x, v1y
+        self.x[j], self.y[j], self.vx[j], self.vy[j] = x2, y2, v2x, v2y
+        
+        return (x1, y1) != before[:2]
+    
+    def step(self, dt):
+        
+        # One time step in the same order as simulate: move, walls, circles
+        
+        self.integrate(dt)
+        self.wallCollisions()
+        self.pairCollisions()
+        self.stepCount += 1
+    
+    def draw(self, vis):
+        
+        # Draws circle k with colour index k
+        
+        drawCircles(vis, self.x, self.y, self.radius)
+
+
+def runSimulation(system,simSteps,dt,vis=None,renderEvery=1,frameSink=None,checkpointPath=None,checkpointEvery=None):
+    
+    """
+    Step a particle system, drawing or emitting a frame every few steps.
 
     Parameters
     ----------
+    system : ParticleSystem
+        The circles to simulate; updated in place.
     simSteps : int
         Number of time steps to run the simulation.
+    dt : float
+        Time step size for the simulation.
+    vis : visualize, optional
+        Visualizer to draw the circles with. None runs headless.
+    renderEvery : int, optional
+        Draw and emit a frame after every renderEvery-th step.
+    frameSink : callable, optional
+        Called as frameSink(step, x, y, vx, vy) on every frame with the
+        system's arrays. The arrays are the live state, so copy them to
+        keep them.
+    checkpointPath : str, optional
+        File to save a checkpoint to, see saveCheckpoint.
+    checkpointEvery : int, optional
+        Save a checkpoint after every checkpointEvery-th step.
+
+    Returns
+    -------
+    system : ParticleSystem
+        The same system, after the last step.
+
+    """
+    
+    if renderEvery < 1:
+        raise ValueError("renderEvery must be at least 1")
+    if checkpointEvery is not None and checkpointPath is None:
+        raise ValueError("checkpointEvery needs a checkpointPath")
+    
+    finalStep = system.stepCount + simSteps
+    
+    for i in range(simSteps):
+        
+        # update positions, then check for box and circle collisions
+        system.step(dt)
+        
+        # steps are counted on the system, so a restored run keeps the
+        # same checkpoint and frame schedule
+        if checkpointEvery is not None and system.stepCount % checkpointEvery == 0:
+            saveCheckpoint(system, checkpointPath, dt, finalStep)
+        
+        if system.stepCount % renderEvery != 0:
+            continue
+        
+        if frameSink is not None:
+            frameSink(system.stepCount, system.x, system.y, system.vx, system.vy)
+        
+        if vis is not None:
+            # draw circles
+            system.draw(vis)
+            
+            # pause plots and clear window axis 1
+            vis.plotPause()
+            
+            
+            vis.axis1Clear()
+    
+    # redraw circles after last iteration
+    if vis is not None:
+        system.draw(vis)
+    
+    return system
+
+# Counters of a ParticleSystem stored in a checkpoint
+CHECKPOINT_COUNTERS = ('stepCount', 'candidatePairs', 'totalCandidatePairs', 'wallHits', 'pairHits')
+
+def saveCheckpoint(system,path,dt=None,finalStep=None):
+    
+    """
+    Save the full state of a particle system to an .npz file.
+
+    The particle arrays, wall thresholds, step and collision counters,
+    settings and random generator state are stored exactly, so a restored
+    system continues bit for bit like the original. The file is written
+    next to path and then renamed over it, so an interrupted save never
+    leaves a broken checkpoint behind.
+
+    Parameters
+    ----------
+    system : ParticleSystem
+        The system to save.
+    path : str
+        Checkpoint file.
+    dt : float, optional
+        Time step of the run, for resumeSimulation.
+    finalStep : int, optional
+        Step count the run ends at, for resumeSimulation.
+
+    Returns
+    -------
+    None
+
+    """
+    
+    settings = {'box': list(system.box),
+                'broadPhase': system.broadPhase,
+                'precision': system.precision,
+                'dt': dt,
+                'finalStep': finalStep,
+                'rng': system.rng.bit_generator.state if system.rng is not None else None}
+    for name in CHECKPOINT_COUNTERS:
+        settings[name] = getattr(system, name)
+    
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as f:
+        np.savez(f, x=system.x, y=system.y, vx=system.vx, vy=system.vy, radius=system.radius,
+                 xLow=system.xLow, xHigh=system.xHigh, yLow=system.yLow, yHigh=system.yHigh,
+                 settings=np.array(json.dumps(settings)))
+    os.replace(temporary, path)
+
+def loadCheckpoint(path):
+    
+    """
+    Restore a particle system saved by saveCheckpoint.
+
+    Parameters
+    ----------
+    path : str
+        Checkpoint file.
+
+    Returns
+    -------
+    system : ParticleSystem
+        The restored system.
+    dt : float or None
+        Time step of the run, if it was saved.
+    finalStep : int or None
+        Step count the run ends at, if it was saved.
+
+    """
+    
+    with np.load(path) as data:
+        settings = json.loads(str(data['settings']))
+        system = ParticleSystem(data['x'], data['y'], data['vx'], data['vy'], data['radius'],
+                                tuple(settings['box']), settings['broadPhase'], settings['precision'])
+        
+        # the stored thresholds, not recomputed ones
+        system.xLow = data['xLow']
+        system.xHigh = data['xHigh']
+        system.yLow = data['yLow']
+        system.yHigh = data['yHigh']
+    
+    for name in CHECKPOINT_COUNTERS:
+        setattr(system, name, settings[name])
+    
+    if settings['rng'] is not None:
+        bitGenerator = getattr(np.random, settings['rng']['bit_generator'])()
+        bitGenerator.state = settings['rng']
+        system.rng = np.random.Generator(bitGenerator)
+    
+    return system, settings['dt'], settings['finalStep']
+
+def resumeSimulation(path,vis=None,renderEvery=1,frameSink=None,checkpointEvery=None):
+    
+    """
+    Continue a run from its last checkpoint up to its final step.
+
+    Parameters
+    ----------
+    path : str
+        Checkpoint file written by runSimulation.
+    vis, renderEvery, frameSink
+        As for runSimulation.
+    checkpointEvery : int, optional
+        Keep saving checkpoints to the same file this often.
+
+    Returns
+    -------
+    system : ParticleSystem
+        The system after the final step.
+
+    """
+    
+    system, dt, finalStep = loadCheckpoint(path)
+    if dt is None or finalStep is None:
+        raise ValueError(f"{path} was not saved by a run and cannot be resumed")
+    
+    return runSimulation(system, finalStep - system.stepCount, dt, vis, renderEvery, frameSink,
+                         path, checkpointEvery)
+
+class EventScheduler:
+    
+    """
+    Event-driven (time-of-impact) simulation of a particle system.
+
+    Instead of moving every circle by a fixed dt, the scheduler predicts
+    when each circle will next hit a wall or another circle and keeps those
+    predictions in a priority queue. It jumps from one impact to the next,
+    moving and re-predicting only the one or two circles involved, so fast
+    circles cannot pass through each other and no overlap has to be undone
+    after the fact.
+
+    Each circle's position in the system arrays is stored as of its own
+    reference time and is brought up to date when the circle takes part in
+    an event, or for every circle when advance() returns.
+
+    Parameters
+    ----------
+    system : ParticleSystem
+        The circles to simulate; updated in place.
+    lookahead : float, optional
+        Only impacts this far ahead are queued; the queue is rebuilt when
+        the window runs out. Defaults to the time the fastest circle needs
+        to cross the box.
+
+    """
+    
+    def __init__(self, system, lookahead=None):
+        self.system = system
+        self.time = 0.0
+        
+        n = len(system)
+        self.reference = np.zeros(n)
+        self.collisions = np.zeros(n, dtype=np.int64)
+        
+        if lookahead is None:
+            xmin, xmax, ymin, ymax = system.box
+            speed = np.hypot(system.vx, system.vy).max() if n else 0.0
+            lookahead = max(xmax - xmin, ymax - ymin) / speed if speed > 0 else math.inf
+        self.lookahead = lookahead
+        
+        # counters, to compare the work done with a fixed-step run
+        self.wallEvents = 0
+        self.pairEvents = 0
+        self.particleUpdates = 0
+        
+        self.queue = []
+        self.sequence = itertools.count()
+        self.rebuild()
+    
+    def positionsAt(self, t):
+        
+        # Positions of every circle at time t
+        
+        s = self.system
+        elapsed = t - self.reference
+        return s.x + s.vx * elapsed, s.y + s.vy * elapsed
+    
+    def sync(self, t):
+        
+        # Moves every circle to time t
+        
+        s = self.system
+        s.x, s.y = self.positionsAt(t)
+        self.reference[:] = t
+        self.particleUpdates += len(s)
+    
+    def moveTo(self, i, t):
+        
+        # Moves circle i to time t
+        
+        s = self.system
+        s.x[i] += s.vx[i] * (t - self.reference[i])
+        s.y[i] += s.vy[i] * (t - self.reference[i])
+        self.reference[i] = t
+        self.particleUpdates += 1
+    
+    def push(self, t, kind, i, j):
+        
+        # Queues an event, remembering how many collisions its circles had
+        
+        cj = self.collisions[j] if j >= 0 else 0
+        heapq.heappush(self.queue, (t, next(self.sequence), kind, i, j, self.collisions[i], cj))
+    
+    def rebuild(self):
+        
+        # Predicts every impact inside a fresh lookahead window
+        
+        self.sync(self.time)
+        self.queue = []
+        self.horizon = self.time + self.lookahead
+        
+        for i in range(len(self.system)):
+            self.predict(i, firstPartner=i + 1)
+        
+        if self.horizon < math.inf:
+            heapq.heappush(self.queue, (self.horizon, next(self.sequence), 'horizon', -1, -1, 0, 0))
+    
+    def predict(self, i, firstPartner=0):
+        
+        # Queues the next wall impacts of circle i and its impacts with
+        # circles firstPartner onwards, if they happen inside the window
+        
+        s = self.system
+        now = self.time
+        x = s.x[i] + s.vx[i] * (now - self.reference[i])
+        y = s.y[i] + s.vy[i] * (now - self.reference[i])
+        
+        # walls: time until the centre reaches the threshold it moves toward
+        for kind, position, velocity, low, high in (('x', x, s.vx[i], s.xLow[i], s.xHigh[i]),
+                                                    ('y', y, s.vy[i], s.yLow[i], s.yHigh[i])):
+            if velocity > 0:
+                t = now + max((high - position) / velocity, 0.0)
+            elif velocity < 0:
+                t = now + max((low - position) / velocity, 0.0)
+            else:
+                continue
+            if t <= self.horizon:
+                self.push(t, kind, i, -1)
+        
+        # circles: earliest time the centres are one radius sum apart
+        xs, ys = self.positionsAt(now)
+        partners = np.arange(firstPartner, len(s))
+        partners = partners[partners != i]
+        if len(partners) == 0:
+            return
+        
+        dx = xs[partners] - x
+        dy = ys[partners] - y
+        dvx = s.vx[partners] - s.vx[i]
+        dvy = s.vy[partners] - s.vy[i]
+        
+        b = dx * dvx + dy * dvy
+        dvdv = dvx * dvx + dvy * dvy
+        drdr = dx * dx + dy * dy
+        sigma = s.radius[partners] + s.radius[i]
+        d = b * b - dvdv * (drdr - sigma * sigma)
+        
+        approaching = (b < 0) & (d >= 0) & (dvdv > 0)
+        if not approaching.any():
+            return
+        
+        b, dvdv, d = b[approaching], dvdv[approaching], d[approaching]
+        times = now + np.maximum(-(b + np.sqrt(d)) / dvdv, 0.0)
+        
+        for j, t in zip(partners[approaching].tolist(), times.tolist()):
+            if t <= self.horizon:
+                self.push(t, 'pair', i, j)
+    
+    def advance(self, tEnd):
+        
+        """
+        Process every impact up to time tEnd and move all circles to tEnd.
+
+        Parameters
+        ----------
+        tEnd : float
+            Simulation time to advance to.
+
+        Returns
+        -------
+        None
+
+        """
+        
+        s = self.system
+        while self.queue and self.queue[0][0] <= tEnd:
+            t, _, kind, i, j, ci, cj = heapq.heappop(self.queue)
+            
+            if kind == 'horizon':
+                self.time = t
+                self.rebuild()
+                continue
+            
+            # skip predictions made before one of the circles changed course
+            if self.collisions[i] != ci or (j >= 0 and self.collisions[j] != cj):
+                continue
+            
+            self.time = t
+            self.moveTo(i, t)
+            
+            if kind == 'x':
+                s.vx[i] = -s.vx[i]
+                self.wallEvents += 1
+            elif kind == 'y':
+                s.vy[i] = -s.vy[i]
+                self.wallEvents += 1
+            else:
+                self.moveTo(j, t)
+                s.vx[i], s.vy[i], s.vx[j], s.vy[j] = update_collision_velocity(
+                    float(s.x[i]), float(s.y[i]), float(s.vx[i]), float(s.vy[i]),
+                    float(s.x[j]), float(s.y[j]), float(s.vx[j]), float(s.vy[j]),
+                    s.precision)
+                self.pairEvents += 1
+            
+            self.collisions[i] += 1
+            self.predict(i)
+            if j >= 0:
+                self.collisions[j] += 1
+                self.predict(j)
+        
+        self.time = tEnd
+        self.sync(tEnd)
+
+def simulateEvents(system,duration,frameInterval,vis=None,frameSink=None,lookahead=None):
+    
+    """
+    Run a particle system with the event-driven scheduler.
+
+    Parameters
+    ----------
+    system : ParticleSystem
+        The circles to simulate; updated in place.
+    duration : float
+        Simulated time to run for.
+    frameInterval : float
+        Simulated time between frames. Impacts are handled exactly whatever
+        this is; it only sets how often circles are drawn or emitted.
+    vis : visualize, optional
+        Visualizer to draw the circles with. None runs headless.
+    frameSink : callable, optional
+        Called as frameSink(frame, x, y, vx, vy) on every frame, as in
+        runSimulation.
+    lookahead : float, optional
+        Passed on to EventScheduler.
+
+    Returns
+    -------
+    scheduler : EventScheduler
+        The scheduler, holding the final time and the event counters.
+
+    """
+    
+    scheduler = EventScheduler(system, lookahead)
+    frames = int(math.ceil(duration / frameInterval))
+    
+    for frame in range(1, frames + 1):
+        scheduler.advance(min(frame * frameInterval, duration))
+        
+        if frameSink is not None:
+            frameSink(frame, system.x, system.y, system.vx, system.vy)
+        
+        if vis is not None:
+            system.draw(vis)
+            vis.plotPause()
+            vis.axis1Clear()
+    
+    if vis is not None:
+        system.draw(vis)
+    
+    return scheduler
+
+# Rows of a recorded frame
+FRAME_FIELDS = ('x', 'y', 'vx', 'vy')
+
+class TrajectoryRecorder:
+    
+    """
+    Stream the frames of a simulation into memory-mapped .npy files.
+
+    A recording is a directory holding meta.json, radius.npy and the frames.
+    Each frame is a (4, n) block of x, y, vx and vy, stored with the step
+    number it was taken at. When the number of frames is known the frames go
+    into one preallocated frames.npy; otherwise they go into chunk files of
+    chunkFrames frames each, so a run of any length never holds more than
+    one chunk in memory.
+
+    The recorder can be passed as the frameSink of runSimulation or
+    simulateEvents. Call close(), or use it in a with block, to finish the
+    recording.
+
+    Parameters
+    ----------
+    path : str
+        Directory to write the recording to; created if missing.
+    radius : array_like
+        Radius of each circle.
+    numFrames : int, optional
+        Number of frames that will be recorded. None records open-ended.
+    chunkFrames : int, optional
+        Frames per chunk file for open-ended recordings. A preallocated
+        recording is flushed and its meta.json updated every chunkFrames
+        frames instead, so in both modes an interrupted run can be read up
+        to the last multiple of chunkFrames.
+
+    """
+    
+    def __init__(self, path, radius, numFrames=None, chunkFrames=1024):
+        self.path = path
+        self.radius = np.asarray(radius, dtype=float)
+        self.numFrames = numFrames
+        self.chunkFrames = numFrames if numFrames is not None else chunkFrames
+        # frames between meta.json updates
+        self.metaEvery = chunkFrames
+        self.frames = 0
+        self.chunks = 0
+        self.chunk = None
+        self.steps = None
+        
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'radius.npy'), self.radius)
+        self.writeMeta()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def chunkName(self, index):
+        
+        # File names of chunk index; a preallocated recording is one chunk
+        
+        if self.numFrames is not None:
+            return 'frames.npy', 'steps.npy'
+        return f'frames-{index:05d}.npy', f'steps-{index:05d}.npy'
+    
+    def openChunk(self):
+        
+        # Preallocates the next chunk on disk and maps it
+        
+        framesName, stepsName = self.chunkName(self.chunks)
+        shape = (self.chunkFrames, len(FRAME_FIELDS), len(self.radius))
+        self.chunk = np.lib.format.open_memmap(os.path.join(self.path, framesName),
+                                               mode='w+', dtype=np.float64, shape=shape)
+        self.steps = np.lib.format.open_memmap(os.path.join(self.path, stepsName),
+                                               mode='w+', dtype=np.int64, shape=(self.chunkFrames,))
+        self.chunks += 1
+    
+    def flushChunk(self):
+        
+        # Writes the mapped chunk back to disk and releases it
+        
+        if self.chunk is not None:
+            self.chunk.flush()
+            self.steps.flush()
+            self.chunk = None
+            self.steps = None
+    
+    def __call__(self, step, x, y, vx, vy):
+        
+        # Records one frame
+        
+        if self.numFrames is not None and self.frames >= self.numFrames:
+            raise ValueError(f"recording is full ({self.numFrames} frames)")
+        
+        row = self.frames % self.chunkFrames
+        if row == 0:
+            # the frames so far stay readable if the run is interrupted
+            self.flushChunk()
+            self.writeMeta()
+            self.openChunk()
+        elif self.frames % self.metaEvery == 0:
+            # a preallocated recording is a single chunk, so its progress is
+            # flushed and recorded as it fills
+            self.chunk.flush()
+            self.steps.flush()
+            self.writeMeta()
+        
+        self.chunk[row, 0] = x
+        self.chunk[row, 1] = y
+        self.chunk[row, 2] = vx
+        self.chunk[row, 3] = vy
+        self.steps[row] = step
+        self.frames += 1
+    
+    def writeMeta(self):
+        
+        # Records how the frames are laid out, for TrajectoryReader
+        
+        meta = {'particles': len(self.radius),
+                'frames': self.frames,
+                'chunk_frames': self.chunkFrames,
+                'chunks': self.chunks,
+                'preallocated': self.numFrames is not None}
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+    
+    def close(self):
+        self.flushChunk()
+        self.writeMeta()
+
+
+class TrajectoryReader:
+    
+    """
+    Read a recording written by TrajectoryRecorder.
+
+    Chunks are opened memory-mapped and read only, so frames are loaded
+    from disk as they are used.
+
+    Parameters
+    ----------
+    path : str
+        Directory of the recording.
+
+    """
+    
+    def __init__(self, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        
+        self.path = path
+        self.frames = meta['frames']
+        self.chunkFrames = meta['chunk_frames']
+        self.radius = np.load(os.path.join(path, 'radius.npy'))
+        
+        self.chunks = []
+        for index in range(meta['chunks']):
+            if meta['preallocated']:
+                names = ('frames.npy', 'steps.npy')
+            else:
+                names = (f'frames-{index:05d}.npy', f'steps-{index:05d}.npy')
+            self.chunks.append(tuple(np.load(os.path.join(path, name), mmap_mode='r') for name in names))
+    
+    def __len__(self):
+        return self.frames
+    
+    def __getitem__(self, frame):
+        
+        """
+        Return frame number frame as (step, x, y, vx, vy).
+        """
+        
+        if frame < 0:
+            frame += self.frames
+        if not 0 <= frame < self.frames:
+            raise IndexError("frame index out of range")
+        
+        data, steps = self.chunks[frame // self.chunkFrames]
+        row = frame % self.chunkFrames
+        return int(steps[row]), data[row, 0], data[row, 1], data[row, 2], data[row, 3]
+    
+    def __iter__(self):
+        for frame in range(self.frames):
+            yield self[frame]
+
+def replayTrajectory(path,vis,renderEvery=1):
+    
+    """
+    Draw a recorded run with the visualizer, without recomputing physics.
+
+    Parameters
+    ----------
+    path : str
+        Directory of a recording made by TrajectoryRecorder.
     vis : visualize
         An instance of the 'visualize' class for visualization.
+    renderEvery : int, optional
+        Draw only every renderEvery-th recorded frame.
+
+    Returns
+    -------
+    None
+
+    """
+    
+    reader = TrajectoryReader(path)
+    if len(reader) == 0:
+        return
+    
+    for frame in range(0, len(reader), renderEvery):
+        step, x, y, vx, vy = reader[frame]
+        
+        # draw circles
+        drawCircles(vis, x, y, reader.radius)
+        
+        # pause plots and clear window axis 1
+        vis.plotPause()
+        
+        
+        vis.axis1Clear()
+    
+    # redraw circles of the last frame
+    step, x, y, vx, vy = reader[len(reader) - 1]
+    drawCircles(vis, x, y, reader.radius)
+
+def simulate(simSteps,vis,x1,y1,x2,y2,v1x,v1y,v2x,v2y,dt,radius,renderEvery=1,frameSink=None,precision='legacy-3dp'):
+    
+    """
+    Run a particle simulation for a specified number of time steps.
+
+    Parameters
+    ----------
+    simSteps : int
+        Number of time steps to run the simulation.
+    vis : visualize or None
+        An instance of the 'visualize' class for visualization, or None to
+        run headless inside the default (0, 1, 0, 1) window.
     x1 : float
         Initial x-coordinate of the center of circle 1.
     y1 : float
@@ -259,10 +1340,19 @@ def simulate(simSteps,vis,x1,y1,x2,y2,v1x,v1y,v2x,v2y,dt,radius):
         Time step size for the simulation.
     radius : float
         Radius of both particles.
+    renderEvery : int, optional
+        Draw the circles after every renderEvery-th step only.
+    frameSink : callable, optional
+        Receives the position and velocity arrays on every rendered step,
+        see runSimulation.
+    precision : {'legacy-3dp', 'full'}, optional
+        Round to 3 decimal places after each operation, as the original
+        simulation did, or keep full float64 precision.
 
     Returns
     -------
-    None
+    system : ParticleSystem
+        The two circles after the last step.
 
     """
     
@@ -273,60 +1363,404 @@ def simulate(simSteps,vis,x1,y1,x2,y2,v1x,v1y,v2x,v2y,dt,radius):
     # provided as 'vis'.
     
     
-    # Identify the boundary location for the containing window
-    # Assumption: both particles have the same radius.
-    xLow,yLow,xHigh, yHigh = boundary_locations(vis,radius) 
+    # The two circles are a particle system of size two; its boundaries
+    # match boundary_locations(vis, radius) because both share one radius.
+    if vis is not None:
+        box = (vis.Ax1xmin, vis.Ax1xmax, vis.Ax1ymin, vis.Ax1ymax)
+    else:
+        box = (0, 1, 0, 1)
+    system = ParticleSystem([x1, x2], [y1, y2], [v1x, v2x], [v1y, v2y], radius, box,
+                            precision=precision)
     
-    for i in range(simSteps):
+    return runSimulation(system, simSteps, dt, vis, renderEvery, frameSink)
         
-            
+def randomSystem(numParticles,radius,speed,seed=None,box=(0, 1, 0, 1),**options):
+    
+    """
+    Build a particle system with random, non-overlapping starting circles.
+
+    Circles are placed one per cell of a square lattice that fits inside the
+    box, shuffled, and given velocities of the same speed in random
+    directions.
+
+    Parameters
+    ----------
+    numParticles : int
+        Number of circles.
+    radius : float
+        Radius of every circle.
+    speed : float
+        Initial speed of every circle.
+    seed : int, optional
+        Seed for the random generator.
+    box : tuple of float, optional
+        Window limits (xmin, xmax, ymin, ymax).
+    **options
+        Passed on to ParticleSystem.
+
+    Returns
+    -------
+    system : ParticleSystem
+
+    """
     
+    rng = np.random.default_rng(seed)
+    xmin, xmax, ymin, ymax = box
     
-        # update x, y position of particles
-        x1 = updateX(x1,v1x,dt)
-        y1 = updateY(y1,v1y,dt)
-        
-        x2 = updateX(x2,v2x,dt)
-        y2 = updateY(y2,v2y,dt)
-            
-        
-                    
-        # Check for box and circle collisions
-        
-        x1,y1,v1x,v1y = boxCollision(x1,y1,v1x,v1y,xLow,xHigh,yLow,yHigh)
-        
-        
-        
-        x2,y2,v2x,v2y = boxCollision(x2,y2,v2x,v2y,xLow,xHigh,yLow,yHigh)
-        
+    # lattice cells at least one diameter apart, inside the wall thresholds
+    side = int(math.ceil(math.sqrt(numParticles)))
+    xs = np.linspace(xmin + radius, xmax - radius, side)
+    ys = np.linspace(ymin + radius, ymax - radius, side)
+    if side > 1 and min(xs[1] - xs[0], ys[1] - ys[0]) < 2 * radius:
+        raise ValueError(f"{numParticles} circles of radius {radius} do not fit in the box")
+    
+    gx, gy = np.meshgrid(xs, ys)
+    cells = rng.permutation(side * side)[:numParticles]
+    angle = rng.uniform(0, 2 * math.pi, numParticles)
+    
+    system = ParticleSystem(gx.ravel()[cells], gy.ravel()[cells],
+                            speed * np.cos(angle), speed * np.sin(angle),
+                            radius, box, **options)
+    
+    # kept with the system so checkpoints carry its state
+    system.rng = rng
+    return system
+
+def kineticEnergy(system):
+    
+    # Total kinetic energy of the circles, all with unit mass
+    
+    return 0.5 * float(np.sum(system.vx ** 2 + system.vy ** 2))
+
+def checkBroadPhase(numParticles=100,simSteps=200,dt=0.01,radius=0.03,speed=1.0,seed=0):
+    
+    """
+    Check that the grid broad phase gives exactly the all-pairs results.
+
+    The same random scene is stepped with broadPhase='grid' and
+    broadPhase='all' in every precision mode, and the positions, velocities
+    and collision counts are compared after every step.
+
+    Parameters
+    ----------
+    numParticles, simSteps, dt, radius, speed, seed
+        Scene and run settings, see randomSystem and runSimulation.
+
+    Returns
+    -------
+    mismatches : dict
+        For each precision mode, the first step at which the two broad
+        phases differ, or None if they agree throughout.
+
+    """
+    
+    mismatches = {}
+    for precision in PRECISION_MODES:
+        grid = randomSystem(numParticles, radius, speed, seed, precision=precision)
+        full = randomSystem(numParticles, radius, speed, seed, precision=precision, broadPhase='all')
+        mismatches[precision] = None
+        for step in range(1, simSteps + 1):
+            grid.step(dt)
+            full.step(dt)
+            same = (grid.pairHits == full.pairHits and grid.wallHits == full.wallHits
+                    and all(np.array_equal(getattr(grid, name), getattr(full, name))
+                            for name in ('x', 'y', 'vx', 'vy')))
+            if not same:
+                mismatches[precision] = step
+                break
         
-        x1,y1,v1x,v1y, x2,y2,v2x,v2y = circleCollision\
-                                      (x1,y1,radius,v1x, \
-                                        v1y, x2,y2,radius,v2x,v2y)
-                    
+        status = 'ok' if mismatches[precision] is None else f'differs at step {mismatches[precision]}'
+        print(f'{precision:<12}{grid.pairHits:>8} collisions  {status}')
+    
+    return mismatches
+
+def benchmarkPrecision(numParticles=200,simSteps=2000,dt=0.01,radius=0.01,speed=0.5,seed=0):
+    
+    """
+    Compare run time and energy conservation of the two precision modes.
+
+    The same random scene is run headless once per precision mode. Elastic
+    collisions conserve kinetic energy, so the relative change in energy
+    over the run measures how far the numbers have drifted from the
+    physics.
+
+    Parameters
+    ----------
+    numParticles, simSteps, dt, radius, speed, seed
+        Scene and run settings, see randomSystem and runSimulation.
+
+    Returns
+    -------
+    results : dict
+        For each precision mode, the elapsed seconds, steps per second and
+        relative energy drift.
+
+    """
+    
+    import time
+    
+    results = {}
+    for precision in PRECISION_MODES:
+        system = randomSystem(numParticles, radius, speed, seed, precision=precision)
+        startEnergy = kineticEnergy(system)
         
-                    
-        # draw circles
-        vis.circle(x1, y1, radius, 0)
-        vis.circle(x2, y2, radius, 1)
+        start = time.perf_counter()
+        runSimulation(system, simSteps, dt)
+        elapsed = time.perf_counter() - start
         
-                    
-        # pause plots and clear window axis 1
-        vis.plotPause()
+        drift = abs(kineticEnergy(system) - startEnergy) / startEnergy
+        results[precision] = {'seconds': elapsed,
+                              'steps_per_second': simSteps / elapsed,
+                              'energy_drift': drift}
+    
+    print(f'{numParticles} circles, {simSteps} steps of dt = {dt}')
+    print(f'{"precision":<12}{"seconds":>10}{"steps/s":>12}{"energy drift":>15}')
+    for precision, row in results.items():
+        print(f'{precision:<12}{row["seconds"]:>10.3f}{row["steps_per_second"]:>12.1f}{row["energy_drift"]:>15.3e}')
+    
+    return results
+
+# Columns of an ensemble parameter table: the inputs of main()'s scenario
+ENSEMBLE_INPUTS = ('x1', 'y1', 'x2', 'y2', 'v1x', 'v1y', 'v2x', 'v2y', 'dt', 'radius')
+
+# Columns of the summary table an ensemble returns, one row per run
+ENSEMBLE_OUTPUTS = ('wall_collisions', 'pair_collisions', 'start_energy', 'end_energy', 'energy_drift')
+
+def runScenario(parameters,simSteps,precision='legacy-3dp'):
+    
+    """
+    Run one headless two-circle scenario and summarise it.
+
+    Parameters
+    ----------
+    parameters : array_like
+        One row of an ensemble table, in ENSEMBLE_INPUTS order.
+    simSteps : int
+        Number of time steps to run.
+    precision : {'legacy-3dp', 'full'}, optional
+        Precision mode of the run.
+
+    Returns
+    -------
+    summary : tuple of float
+        The run's values in ENSEMBLE_OUTPUTS order.
+
+    """
+    
+    x1, y1, x2, y2, v1x, v1y, v2x, v2y, dt, radius = (float(value) for value in parameters)
+    
+    system = ParticleSystem([x1, x2], [y1, y2], [v1x, v2x], [v1y, v2y], radius,
+                            precision=precision)
+    startEnergy = kineticEnergy(system)
+    runSimulation(system, simSteps, dt)
+    endEnergy = kineticEnergy(system)
+    
+    drift = abs(endEnergy - startEnergy) / startEnergy if startEnergy > 0 else math.nan
+    return system.wallHits, system.pairHits, startEnergy, endEnergy, drift
+
+# Shared-memory tables of the ensemble a worker process belongs to
+ensembleWorker = {}
+
+def attachEnsemble(inputName,outputName,runs,simSteps,precision):
+    
+    # Pool initializer: maps the shared input and output tables once per
+    # worker, so tasks only carry row numbers
+    
+    from multiprocessing import shared_memory
+    
+    inputMemory = shared_memory.SharedMemory(name=inputName)
+    outputMemory = shared_memory.SharedMemory(name=outputName)
+    ensembleWorker.update(
+        inputMemory=inputMemory,
+        outputMemory=outputMemory,
+        inputs=np.ndarray((runs, len(ENSEMBLE_INPUTS)), dtype=np.float64, buffer=inputMemory.buf),
+        outputs=np.ndarray((runs, len(ENSEMBLE_OUTPUTS)), dtype=np.float64, buffer=outputMemory.buf),
+        simSteps=simSteps,
+        precision=precision)
+
+def runEnsembleRows(start,stop):
+    
+    # Pool task: runs rows start to stop of the shared table in place
+    
+    inputs = ensembleWorker['inputs']
+    outputs = ensembleWorker['outputs']
+    for row in range(start, stop):
+        outputs[row] = runScenario(inputs[row], ensembleWorker['simSteps'], ensembleWorker['precision'])
+    return stop - start
+
+def runEnsemble(parameters,simSteps,precision='legacy-3dp',processes=None,chunkSize=None):
+    
+    """
+    Run many independent scenarios across a process pool.
+
+    The parameter table is copied once into shared memory and every worker
+    writes its summaries straight into a shared output table, so only row
+    ranges travel between processes.
+
+    Parameters
+    ----------
+    parameters : array_like
+        Table of shape (runs, len(ENSEMBLE_INPUTS)), one scenario per row.
+    simSteps : int
+        Number of time steps of every run.
+    precision : {'legacy-3dp', 'full'}, optional
+        Precision mode of every run.
+    processes : int, optional
+        Number of worker processes; defaults to the number of CPUs. With 1
+        the runs are done in this process.
+    chunkSize : int, optional
+        Runs per task. Defaults to spreading the runs over about four tasks
+        per worker.
+
+    Returns
+    -------
+    summary : ndarray
+        Table of shape (runs, len(ENSEMBLE_OUTPUTS)), one row per run.
+
+    """
+    
+    parameters = np.asarray(parameters, dtype=np.float64)
+    if parameters.ndim != 2 or parameters.shape[1] != len(ENSEMBLE_INPUTS):
+        raise ValueError(f"parameters must have one column per input {ENSEMBLE_INPUTS}")
+    checkPrecision(precision)
+    
+    runs = len(parameters)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    
+    if processes == 1 or runs <= 1:
+        summary = np.empty((runs, len(ENSEMBLE_OUTPUTS)))
+        for row in range(runs):
+            summary[row] = runScenario(parameters[row], simSteps, precision)
+        return summary
+    
+    import multiprocessing
+    from multiprocessing import shared_memory
+    
+    if chunkSize is None:
+        chunkSize = max(1, runs // (4 * processes))
+    tasks = [(start, min(start + chunkSize, runs)) for start in range(0, runs, chunkSize)]
+    
+    inputMemory = shared_memory.SharedMemory(create=True, size=max(parameters.nbytes, 1))
+    outputMemory = shared_memory.SharedMemory(create=True, size=max(runs * len(ENSEMBLE_OUTPUTS) * 8, 1))
+    try:
+        inputs = np.ndarray(parameters.shape, dtype=np.float64, buffer=inputMemory.buf)
+        inputs[:] = parameters
+        outputs = np.ndarray((runs, len(ENSEMBLE_OUTPUTS)), dtype=np.float64, buffer=outputMemory.buf)
         
+        with multiprocessing.Pool(processes, initializer=attachEnsemble,
+                                  initargs=(inputMemory.name, outputMemory.name,
+                                            runs, simSteps, precision)) as pool:
+            pool.starmap(runEnsembleRows, tasks)
         
-        vis.axis1Clear()
+        summary = outputs.copy()
+        del inputs, outputs
+    finally:
+        inputMemory.close()
+        inputMemory.unlink()
+        outputMemory.close()
+        outputMemory.unlink()
     
-    # redraw circles after last iteration
-    vis.circle(x1, y1, radius, 0)
-    vis.circle(x2, y2, radius, 1)
-        
+    return summary
+
+def randomScenarios(runs,radii,dts,maxSpeed=0.1,seed=None):
+    
+    """
+    Build an ensemble table of random two-circle scenarios.
+
+    Every combination of radius and dt gets runs scenarios with random,
+    non-overlapping starting positions inside the (0, 1, 0, 1) box and
+    velocity components drawn from [-maxSpeed, maxSpeed].
+
+    Parameters
+    ----------
+    runs : int
+        Scenarios per (radius, dt) combination.
+    radii, dts : sequence of float
+        Radii and time steps to sweep over.
+    maxSpeed : float, optional
+        Largest velocity component.
+    seed : int, optional
+        Seed for the random generator.
+
+    Returns
+    -------
+    parameters : ndarray
+        Table in ENSEMBLE_INPUTS order.
+
+    """
+    
+    rng = np.random.default_rng(seed)
+    blocks = []
+    for radius in radii:
+        for dt in dts:
+            low, high = radius, 1 - radius
+            positions = rng.uniform(low, high, (runs, 4))
+            
+            # redraw the second circle until the pair starts apart
+            overlap = np.hypot(positions[:, 0] - positions[:, 2], positions[:, 1] - positions[:, 3]) < 2 * radius
+            while overlap.any():
+                positions[overlap, 2:] = rng.uniform(low, high, (int(overlap.sum()), 2))
+                overlap = np.hypot(positions[:, 0] - positions[:, 2], positions[:, 1] - positions[:, 3]) < 2 * radius
+            
+            velocities = rng.uniform(-maxSpeed, maxSpeed, (runs, 4))
+            settings = np.tile([dt, radius], (runs, 1))
+            blocks.append(np.hstack([positions, velocities, settings]))
+    
+    return np.vstack(blocks)
+
+def ensembleMain(argv=None):
+    
+    # Command line entry point: "python projectA.py ensemble --help"
+    
+    import argparse
+    import time
+    
+    parser = argparse.ArgumentParser(prog='projectA.py ensemble',
+                                     description='Run a parameter sweep of headless two-circle simulations.')
+    parser.add_argument('--runs', type=int, default=100, help='scenarios per radius and dt (default 100)')
+    parser.add_argument('--steps', type=int, default=800, help='time steps per run (default 800)')
+    parser.add_argument('--radius', type=float, nargs='+', default=[0.15], help='radii to sweep (default 0.15)')
+    parser.add_argument('--dt', type=float, nargs='+', default=[0.2], help='time steps to sweep (default 0.2)')
+    parser.add_argument('--max-speed', type=float, default=0.1, help='largest velocity component (default 0.1)')
+    parser.add_argument('--precision', choices=PRECISION_MODES, default='legacy-3dp')
+    parser.add_argument('--processes', type=int, default=None, help='worker processes (default: all CPUs)')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', help='write the inputs and summaries of every run to this CSV file')
+    args = parser.parse_args(argv)
+    
+    parameters = randomScenarios(args.runs, args.radius, args.dt, args.max_speed, args.seed)
+    
+    start = time.perf_counter()
+    summary = runEnsemble(parameters, args.steps, args.precision, args.processes)
+    elapsed = time.perf_counter() - start
+    
+    print(f'{len(parameters)} runs of {args.steps} steps in {elapsed:.2f} s')
+    for k, name in enumerate(ENSEMBLE_OUTPUTS):
+        column = summary[:, k]
+        print(f'{name:<16} mean {np.nanmean(column):.4g}  min {np.nanmin(column):.4g}  max {np.nanmax(column):.4g}')
+    
+    if args.output:
+        np.savetxt(args.output, np.hstack([parameters, summary]), delimiter=',',
+                   header=','.join(ENSEMBLE_INPUTS + ENSEMBLE_OUTPUTS), comments='')
+
 if __name__ == '__main__': 
     
     # Call the main function to excute the simulation
     # For testing purpose comment main() and call another 
     # function.
-    main()
+    # "python projectA.py benchmark" compares the precision modes instead,
+    # "python projectA.py check" checks the grid broad phase against every
+    # pair, and "python projectA.py ensemble ..." runs a parameter sweep.
+    if sys.argv[1:2] == ['benchmark']:
+        benchmarkPrecision()
+    elif sys.argv[1:2] == ['check']:
+        if any(checkBroadPhase().values()):
+            sys.exit(1)
+    elif sys.argv[1:2] == ['ensemble']:
+        ensembleMain(sys.argv[2:])
+    else:
+        main()
     
     
     
\ No newline at end of file
@@ -1,5 +1,21 @@
 import xml.etree.ElementTree as ET
 import re
+import hashlib
+import heapq
+import json
+import mmap
+import os
+import shutil
+import tempfile
+from array import array
+from bisect import bisect_left
+from collections import Counter, deque
+from collections.abc import Sequence
+from itertools import islice
+from operator import itemgetter
+
+# A Slack mention such as <@U024BE7LH>
+TAG_PATTERN = re.compile(r'<@.+?>')
 
 # DO NOT MODIFY THIS FUNCTION!
 def check_tag_index(tags, tag_text):
@@ -49,16 +65,276 @@ def load_messages(filename):
 
 	return messages
 
+def iter_messages(filename):
+    """
+    Stream the messages of a Slack XML export one at a time.
+
+    Same messages, in the same order, as load_messages, but the file is read
+    with iterparse and every message element is dropped from the tree as
+    soon as its text has been yielded, so memory use stays flat however big
+    the export is.
+
+    Parameters
+    ----------
+    filename : string
+        The current path to the XML file containing the message information.
+
+    Yields
+    ------
+    string
+        The text of each message.
+    """
+    parents = []
+    for event, node in ET.iterparse(filename, events=('start', 'end')):
+        if event == 'start':
+            parents.append(node)
+            continue
+
+        parents.pop()
+        if node.tag != 'message':
+            continue
+
+        text = node.find('text')
+        yield text.text
+
+        # detach the finished message so neither it nor its parent keeps it
+        node.clear()
+        if parents:
+            parents[-1].remove(node)
+
+# Layout of a corpus cache file: a fixed-size JSON header, then the
+# sections listed in it, each starting on an 8-byte boundary
+CACHE_MAGIC = b'SLACKMSG'
+CACHE_VERSION = 1
+CACHE_HEADER_SIZE = 4096
+# header fields and file sections every cache must have
+CACHE_FIELDS = ('count', 'source_mtime_ns', 'source_size', 'source_sha256', 'sections')
+CACHE_SECTIONS = ('offsets', 'missing', 'word_counts', 'tag_offsets', 'tag_blob', 'blob')
+
+def file_digest(filename):
+    # SHA-256 of a file, read in blocks
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def read_cache_header(cache_path):
+    # the JSON header of a cache file, or None if it is not a usable cache
+    try:
+        with open(cache_path, 'rb') as f:
+            raw = f.read(CACHE_HEADER_SIZE)
+            file_size = os.fstat(f.fileno()).st_size
+    except OSError:
+        return None
+    if not raw.startswith(CACHE_MAGIC):
+        return None
+    # a truncated or damaged header is treated like no cache at all
+    try:
+        header = json.loads(raw[len(CACHE_MAGIC):].rstrip(b' ').decode('utf-8'))
+    except ValueError:
+        return None
+    if not isinstance(header, dict) or header.get('version') != CACHE_VERSION:
+        return None
+    if any(field not in header for field in CACHE_FIELDS):
+        return None
+    sections = header['sections']
+    if not isinstance(sections, dict):
+        return None
+    for name in CACHE_SECTIONS:
+        section = sections.get(name)
+        if (not isinstance(section, list) or len(section) != 2
+                or not all(isinstance(value, int) and value >= 0 for value in section)
+                or section[0] + section[1] > file_size):
+            return None
+    return header
+
+def write_cache_header(f, header):
+    raw = CACHE_MAGIC + json.dumps(header).encode('utf-8')
+    if len(raw) > CACHE_HEADER_SIZE:
+        raise ValueError('cache header too large')
+    f.seek(0)
+    f.write(raw.ljust(CACHE_HEADER_SIZE, b' '))
+
+def write_message_cache(filename, cache_path):
+    """
+    Parse an XML export once and write its messages to a cache file.
+
+    The messages are stored as one UTF-8 blob with an offsets array, with
+    their word counts and tags alongside, so MessageCache can map the file
+    and hand out messages without parsing anything.
+
+    Parameters
+    ----------
+    filename : string
+        The XML export.
+    cache_path : string
+        The cache file to write; replaced atomically.
+    """
+    stat = os.stat(filename)
+    offsets = array('Q', [0])
+    missing = array('B')
+    word_counts = array('I')
+    tag_offsets = array('Q', [0])
+    tag_blob = bytearray()
+
+    directory = os.path.dirname(os.path.abspath(cache_path))
+    with tempfile.TemporaryFile(dir=directory) as blob:
+        for text in iter_messages(filename):
+            missing.append(text is None)
+            data = (text or '').encode('utf-8')
+            blob.write(data)
+            offsets.append(offsets[-1] + len(data))
+            word_counts.append(len((text or '').split()))
+            # tags are joined with NUL, which XML text cannot contain
+            tag_blob += '\0'.join(TAG_PATTERN.findall(text or '')).encode('utf-8')
+            tag_offsets.append(len(tag_blob))
+
+        sections = [('offsets', offsets.tobytes()), ('missing', missing.tobytes()),
+                    ('word_counts', word_counts.tobytes()), ('tag_offsets', tag_offsets.tobytes()),
+                    ('tag_blob', bytes(tag_blob))]
+        header = {'version': CACHE_VERSION, 'count': len(word_counts),
+                  'source_mtime_ns': stat.st_mtime_ns, 'source_size': stat.st_size,
+                  'source_sha256': file_digest(filename), 'sections': {}}
+
+        position = CACHE_HEADER_SIZE
+        for name, data in sections:
+            header['sections'][name] = [position, len(data)]
+            position += (len(data) + 7) // 8 * 8
+        header['sections']['blob'] = [position, blob.tell()]
+
+        temporary = cache_path + '.tmp'
+        with open(temporary, 'wb') as f:
+            write_cache_header(f, header)
+            for name, data in sections:
+                f.seek(header['sections'][name][0])
+                f.write(data)
+            f.seek(position)
+            blob.seek(0)
+            shutil.copyfileobj(blob, f)
+        os.replace(temporary, cache_path)
+
+class MessageCache(Sequence):
+    """
+    Messages served from a memory-mapped cache file.
+
+    Opening is constant time: nothing is decoded until a message is asked
+    for. Behaves like the list load_messages returns, and also offers the
+    word counts and tags that were worked out when the cache was written.
+
+    Parameters
+    ----------
+    cache_path : string
+        A file written by write_message_cache.
+    """
+
+    def __init__(self, cache_path):
+        header = read_cache_header(cache_path)
+        if header is None:
+            raise ValueError(f'{cache_path} is not a message cache')
+
+        with open(cache_path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self.map)
+        sections = {name: view[start:start + size] for name, (start, size) in header['sections'].items()}
+
+        self.count = header['count']
+        self.offsets = sections['offsets'].cast('Q')
+        self.missing = sections['missing']
+        self.word_counts = sections['word_counts'].cast('I')
+        self.tag_offsets = sections['tag_offsets'].cast('Q')
+        self.tag_blob = sections['tag_blob']
+        self.blob = sections['blob']
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, ix):
+        if isinstance(ix, slice):
+            return [self[i] for i in range(*ix.indices(self.count))]
+        if ix < 0:
+            ix += self.count
+        if not 0 <= ix < self.count:
+            raise IndexError('message index out of range')
+        if self.missing[ix]:
+            return None
+        return str(self.blob[self.offsets[ix]:self.offsets[ix + 1]], 'utf-8')
+
+    def tags(self, ix):
+        """
+        The tags in message ix, in the order they appear.
+        """
+        data = str(self.tag_blob[self.tag_offsets[ix]:self.tag_offsets[ix + 1]], 'utf-8')
+        return data.split('\0') if data else []
+
+def load_messages_cached(filename, cache_path=None):
+    """
+    Load messages like load_messages, through a binary cache file.
+
+    The first load parses the XML and writes the cache next to it. Later
+    loads map the cache instead, as long as the source still has the
+    recorded size and modification time. If only the modification time
+    changed, the file is hashed and the cache reused when the contents
+    are the same.
+
+    Parameters
+    ----------
+    filename : string
+        The current path to the XML file containing the message information.
+    cache_path : string, optional
+        Where to keep the cache; defaults to filename + '.msgcache'.
+
+    Returns
+    -------
+    messages : MessageCache
+        The messages, one per element.
+    """
+    if cache_path is None:
+        cache_path = filename + '.msgcache'
+
+    stat = os.stat(filename)
+    header = read_cache_header(cache_path)
+    fresh = (header is not None and header['source_size'] == stat.st_size
+             and header['source_mtime_ns'] == stat.st_mtime_ns)
+
+    if header is not None and not fresh and header['source_size'] == stat.st_size:
+        if header['source_sha256'] == file_digest(filename):
+            # touched but unchanged: record the new time and keep the cache
+            header['source_mtime_ns'] = stat.st_mtime_ns
+            with open(cache_path, 'r+b') as f:
+                write_cache_header(f, header)
+            fresh = True
+
+    if not fresh:
+        write_message_cache(filename, cache_path)
+    return MessageCache(cache_path)
+
 def get_num_messages(messages):
-	return len(messages)
+    if isinstance(messages, Sequence):
+        return len(messages)
+    return sum(1 for _ in messages)
 
 def get_message(messages, ix):
-	return messages[ix]
+    if isinstance(messages, Sequence):
+        return messages[ix]
+    try:
+        return next(islice(messages, ix, None))
+    except StopIteration:
+        raise IndexError('message index out of range') from None
 
 def concatenate_messages(messages, ix1, ix2, separator):
-	return separator.join([messages[ix1], messages[ix2]])
+    if not isinstance(messages, Sequence):
+        # pick both messages out of the stream in one pass
+        wanted = {ix1, ix2}
+        found = {i: msg for i, msg in islice(enumerate(messages), max(wanted) + 1) if i in wanted}
+        if len(found) < len(wanted):
+            raise IndexError('message index out of range')
+        messages = found
+    return separator.join([messages[ix1], messages[ix2]])
 
 def get_message_num_words(messages):
+	if isinstance(messages, MessageCache):
+		return messages.word_counts.tolist()
 	return [len(i.split()) for i in messages]
 
 def get_message_avg_word_lengths(messages):
@@ -79,8 +355,7 @@ def search_messages(messages, search_term, is_case_sensitive):
     messages_index = []
     in_messages_index = []
     
-    for i in range(len(messages)):
-        msg = messages[i]
+    for i, msg in enumerate(messages):
         k = 0
         while k <= len(msg) - len(search_term):
             search_area = msg[k:k + len(search_term)]
@@ -97,6 +372,159 @@ def search_messages(messages, search_term, is_case_sensitive):
                 k += 1
     return messages_index, in_messages_index     
 
+def lowers_in_place(text):
+    """
+    Whether text.lower() lowers each character to exactly one character.
+
+    For such text, lowering any slice gives the same slice of the lowered
+    text, so a case-insensitive match can be looked up in the lowered text.
+    Lowering never shortens a character, so equal lengths mean a one-to-one
+    mapping; the final-sigma rule is the only one that depends on context.
+    """
+    return len(text.lower()) == len(text) and 'Σ' not in text
+
+def find_all(msg, search_term, is_case_sensitive):
+    """
+    Positions of search_term in msg exactly as search_messages reports them.
+
+    search_messages takes the leftmost match and resumes after it, which is
+    what repeated str.find does. For case-insensitive searches that only
+    holds when both strings lower in place; otherwise the window-by-window
+    scan of search_messages is used.
+    """
+    if not is_case_sensitive:
+        if not (lowers_in_place(msg) and lowers_in_place(search_term)):
+            return search_messages([msg], search_term, is_case_sensitive)[1]
+        msg = msg.lower()
+        search_term = search_term.lower()
+
+    positions = []
+    k = msg.find(search_term)
+    while k != -1:
+        positions.append(k)
+        k = msg.find(search_term, k + len(search_term))
+    return positions
+
+def contains(sorted_ids, i):
+    # binary search of a posting list
+    k = bisect_left(sorted_ids, i)
+    return k < len(sorted_ids) and sorted_ids[k] == i
+
+class MessageIndex:
+    """
+    Reusable search index over a list of messages.
+
+    The index is built once and then answers many queries. It holds two
+    structures:
+
+    * an n-gram index from every lower-cased n-character substring to the
+      messages containing it, used by search to narrow a substring query
+      down to the few messages containing all of the term's n-grams;
+    * a token index from every lower-cased whitespace-separated word to
+      the places it occurs, used by search_word.
+
+    Both return the same (messages_index, in_messages_index) lists as
+    search_messages. Messages can be added later with add_messages.
+
+    Parameters
+    ----------
+    messages : iterable of strings
+        The messages to index.
+    n : int, optional
+        Length of the indexed substrings.
+    """
+
+    def __init__(self, messages=(), n=3):
+        self.n = n
+        self.messages = []
+        self.grams = {}
+        self.tokens = {}
+        # messages an n-gram lookup cannot rule out: shorter than n, or
+        # lower-casing that does not map character for character
+        self.always_check = []
+        self.add_messages(messages)
+
+    def __len__(self):
+        return len(self.messages)
+
+    def add_messages(self, messages):
+        """
+        Index further messages, numbered after the ones already indexed.
+        """
+        n = self.n
+        for msg in messages:
+            i = len(self.messages)
+            self.messages.append(msg)
+
+            lowered = msg.lower()
+            if len(msg) < n or not lowers_in_place(msg):
+                self.always_check.append(i)
+            for gram in {lowered[k:k + n] for k in range(len(lowered) - n + 1)}:
+                self.grams.setdefault(gram, []).append(i)
+
+            for match in re.finditer(r'\S+', msg):
+                self.tokens.setdefault(match.group().lower(), []).append((i, match.start()))
+
+    def candidates(self, search_term):
+        """
+        Sorted ids of the messages that may contain search_term in any case.
+        """
+        term = search_term.lower()
+        if not lowers_in_place(search_term):
+            return range(len(self.messages))
+
+        n = self.n
+        if len(term) >= n:
+            postings = [self.grams.get(term[k:k + n], []) for k in range(len(term) - n + 1)]
+            postings.sort(key=len)
+            found = postings[0]
+            # keep the ids of the rarest n-gram that every other one shares
+            for posting in postings[1:]:
+                if not found:
+                    break
+                found = [i for i in found if contains(posting, i)]
+        else:
+            # a short term lies inside some n-gram of every longer message
+            # that contains it
+            found = set()
+            for gram, posting in self.grams.items():
+                if term in gram:
+                    found.update(posting)
+
+        return sorted(set(found).union(self.always_check))
+
+    def search(self, search_term, is_case_sensitive):
+        """
+        Same result as search_messages(messages, search_term, is_case_sensitive).
+        """
+        if search_term == '':
+            raise ValueError('search_term must not be empty')
+
+        messages_index = []
+        in_messages_index = []
+        for i in self.candidates(search_term):
+            positions = find_all(self.messages[i], search_term, is_case_sensitive)
+            messages_index.extend([i] * len(positions))
+            in_messages_index.extend(positions)
+        return messages_index, in_messages_index
+
+    def search_word(self, word, is_case_sensitive):
+        """
+        Occurrences of word as a whole whitespace-separated word.
+
+        Returns the same kind of (messages_index, in_messages_index) lists
+        as search, but only for matches that are complete words.
+        """
+        messages_index = []
+        in_messages_index = []
+        for i, k in self.tokens.get(word.lower(), []):
+            token = self.messages[i][k:k + len(word)]
+            if is_case_sensitive and token != word:
+                continue
+            messages_index.append(i)
+            in_messages_index.append(k)
+        return messages_index, in_messages_index
+
 def replace_search_word_in_messages(messages, search_term, replacement, is_case_sensitive):
 	
     replacements = 0
@@ -124,54 +552,558 @@ def replace_search_word_in_messages(messages, search_term, replacement, is_case_
     return replacements
         
         
-def count_tagged_people(messages):
-    tagged_people = []
-    tag_index = []
-    
+def fold_case(text):
+    # lower-cases character by character, so positions in the folded text
+    # are positions in the original
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+class TermAutomaton:
+    """
+    Aho-Corasick automaton that finds many search terms in one pass.
+
+    The terms are stored in a trie whose states also carry failure links
+    (the longest proper suffix that is also a trie path) and output links
+    (the nearest state along the failure chain that ends a term). Scanning a
+    text then visits every character once, whatever the number of terms.
+
+    Parameters
+    ----------
+    terms : iterable of strings
+        The terms to look for.
+    is_case_sensitive : bool
+        Whether matches must have the same case as the term. Otherwise
+        every character is compared lower-cased.
+    """
+
+    def __init__(self, terms, is_case_sensitive):
+        self.is_case_sensitive = is_case_sensitive
+        self.goto = [{}]
+        self.fail = [0]
+        self.term = [None]
+        self.output = [0]
+
+        for term in terms:
+            if term == '':
+                raise ValueError('search terms must not be empty')
+            key = term if is_case_sensitive else fold_case(term)
+            state = 0
+            for c in key:
+                if c not in self.goto[state]:
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.term.append(None)
+                    self.output.append(0)
+                    self.goto[state][c] = len(self.goto) - 1
+                state = self.goto[state][c]
+            # terms that only differ in case share a state; the first wins
+            if self.term[state] is None:
+                self.term[state] = term
+
+        # breadth-first, so every failure target is finished before use
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            fail = self.fail[state]
+            self.output[state] = fail if self.term[fail] is not None else self.output[fail]
+            for c, child in self.goto[state].items():
+                target = fail
+                while target and c not in self.goto[target]:
+                    target = self.fail[target]
+                self.fail[child] = self.goto[target].get(c, 0)
+                queue.append(child)
+
+    def find(self, text):
+        """
+        Find the terms in text, leftmost first and longest at each position.
+
+        Matches never overlap: after a match the scan carries on after its
+        end, as search_messages does for a single term.
+
+        Returns
+        -------
+        list of (int, string)
+            The start of each match and the term it matched.
+        """
+        if not self.is_case_sensitive:
+            text = fold_case(text)
+
+        goto, fail, term, output = self.goto, self.fail, self.term, self.output
+        found = []
+        state = 0
+        for k, c in enumerate(text):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+
+            # every term ending here, longest first along the output chain
+            match = state if term[state] is not None else output[state]
+            while match:
+                found.append((k + 1 - len(term[match]), term[match]))
+                match = output[match]
+
+        # keep the leftmost, then longest, match and skip what it covers
+        found.sort(key=lambda m: (m[0], -len(m[1])))
+        chosen = []
+        end = 0
+        for start, matched in found:
+            if start >= end:
+                chosen.append((start, matched))
+                end = start + len(matched)
+        return chosen
+
+def replace_terms_in_messages(messages, replacements, is_case_sensitive):
+    """
+    Replace many search terms in every message in a single pass.
+
+    Like calling replace_search_word_in_messages once per term, but every
+    message is scanned once by a TermAutomaton and rebuilt with a single
+    join. Where terms overlap the leftmost match wins, and the longest one
+    if several start at the same place.
+
+    Parameters
+    ----------
+    messages : list of strings
+        The messages; changed messages are replaced in the list.
+    replacements : dict
+        Maps each search term to the string that replaces it.
+    is_case_sensitive : bool
+        Whether matches must have the same case as the term.
+
+    Returns
+    -------
+    dict
+        The number of replacements made for each term.
+    """
+    automaton = TermAutomaton(replacements, is_case_sensitive)
+    counts = dict.fromkeys(replacements, 0)
+
+    for i, msg in enumerate(messages):
+        matches = automaton.find(msg)
+        if not matches:
+            continue
+
+        pieces = []
+        last_index = 0
+        for start, term in matches:
+            pieces.append(msg[last_index:start])
+            pieces.append(replacements[term])
+            last_index = start + len(term)
+            counts[term] += 1
+        pieces.append(msg[last_index:])
+        messages[i] = ''.join(pieces)
+
+    return counts
+
+def count_tags(messages):
+    """
+    Count how often each person is tagged, using a hash map.
+
+    Parameters
+    ----------
+    messages : iterable of strings
+        The messages to scan.
+
+    Returns
+    -------
+    Counter
+        Maps each tag to its count, in the order tags are first seen.
+    """
+    tag_counts = Counter()
+    if isinstance(messages, MessageCache):
+        for ix in range(len(messages)):
+            tag_counts.update(messages.tags(ix))
+        return tag_counts
+
     for message in messages:
-        tags = re.findall(r'<@.+?>', message)
-        for tag in tags:
-            tag_ix = check_tag_index(tagged_people, tag)
-            if tag_ix == -1:
-                tagged_people.append(tag)
-                tag_index.append(1)
-            else:
-                tag_index[tag_ix] += 1
-    return tagged_people, tag_index
+        tag_counts.update(TAG_PATTERN.findall(message))
+    return tag_counts
 
-def generate_productivity_report(messages):
-    num_messages = get_num_messages(messages)
-    print(f'There are {num_messages} messages in the database.')
-    
-    words_per_message = get_message_num_words(messages)
-    total_words = 0
-    for count in words_per_message:
-        total_words += count
-    avg_words = total_words / len(words_per_message)
-    print(f'Average words per message: {avg_words:.2f}.')
-    
-    avg_word_lengths_per_msg = get_message_avg_word_lengths(messages)
-    total_word_length = 0
-    for avg_len in avg_word_lengths_per_msg:
-        total_word_length += avg_len
-    avg_word_length_overall = total_word_length / len(avg_word_lengths_per_msg)
-    print(f'Average word length overall: {avg_word_length_overall:.2f}.')
-    
-    tags, tag_counts = count_tagged_people(messages)
-    
-    max_count = 0
-    max_index = 0
-    
-    for i in range(len(tag_counts)):
-        if tag_counts[i] > max_count:
-            max_count = tag_counts[i]
-            max_index = i
-    print(f'The person tagged the most is: {tags[max_index]} with {max_count} tags.')
+def top_tagged_people(tag_counts, k):
+    """
+    The k most tagged people, most tagged first.
+
+    Selected with a heap in O(n log k). Ties keep the order the tags were
+    first seen in, so the first result is the person
+    generate_productivity_report has always named.
+
+    Parameters
+    ----------
+    tag_counts : Counter or dict
+        Tag counts as returned by count_tags.
+    k : int
+        How many people to return.
+
+    Returns
+    -------
+    list of (string, int)
+        Each tag with its count.
+    """
+    return heapq.nlargest(k, tag_counts.items(), key=itemgetter(1))
+
+def count_tagged_people(messages):
+    # one dictionary lookup per tag instead of a check_tag_index scan
+    tag_counts = count_tags(messages)
+    return list(tag_counts), list(tag_counts.values())
+
+class ProductivityStats:
+    """
+    Running totals behind the productivity report, filled in one pass.
+
+    Each message is split into words once; its word count, word-length
+    average and tags all come from that single visit, so the messages can
+    come from a stream such as iter_messages and are never held in memory.
+
+    Attributes
+    ----------
+    num_messages : int
+        Messages seen so far.
+    total_words : int
+        Sum of the word counts of the messages.
+    total_avg_word_length : float
+        Sum of the average word length of each message, 0 for a message
+        without words, as get_message_avg_word_lengths reports them.
+    tag_counts : Counter
+        How often each person was tagged, in the order first seen.
+    """
+
+    def __init__(self, messages=()):
+        self.num_messages = 0
+        self.total_words = 0
+        self.total_avg_word_length = 0
+        self.tag_counts = Counter()
+        self.update(messages)
+
+    def add(self, message):
+        """
+        Fold one message into the totals.
+        """
+        words = message.split()
+        self.num_messages += 1
+        self.total_words += len(words)
+        if words:
+            self.total_avg_word_length += sum(map(len, words)) / len(words)
+        # most messages tag nobody, so skip the regex for those
+        if '<@' in message:
+            self.tag_counts.update(TAG_PATTERN.findall(message))
+
+    def update(self, messages):
+        """
+        Fold every message of an iterable into the totals.
+        """
+        for message in messages:
+            self.add(message)
+
+    def merge(self, other):
+        """
+        Fold the totals of later messages, counted separately, into these.
+
+        Merging is associative, so shards counted apart can be combined in
+        any grouping; merged in message order, tags keep their first-seen
+        order. Returns self.
+        """
+        self.num_messages += other.num_messages
+        self.total_words += other.total_words
+        self.total_avg_word_length += other.total_avg_word_length
+        self.tag_counts.update(other.tag_counts)
+        return self
+
+    def print_report(self):
+        """
+        Print the report exactly as generate_productivity_report does.
+        """
+        print(f'There are {self.num_messages} messages in the database.')
+        if self.num_messages == 0:
+            return
+
+        avg_words = self.total_words / self.num_messages
+        print(f'Average words per message: {avg_words:.2f}.')
+
+        avg_word_length_overall = self.total_avg_word_length / self.num_messages
+        print(f'Average word length overall: {avg_word_length_overall:.2f}.')
+
+        top = top_tagged_people(self.tag_counts, 1)
+        if not top:
+            print('Nobody was tagged.')
+            return
+
+        tag, max_count = top[0]
+        print(f'The person tagged the most is: {tag} with {max_count} tags.')
+
+def iter_chunks(messages, chunk_size):
+    # splits any iterable of messages into lists of chunk_size messages
+    iterator = iter(messages)
+    chunk = list(islice(iterator, chunk_size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, chunk_size))
+
+def search_chunk(chunk, search_term, is_case_sensitive):
+    # worker task for sharded_search_messages
+    return len(chunk), search_messages(chunk, search_term, is_case_sensitive)
+
+def sharded_productivity_stats(messages, processes=None, chunk_size=10000):
+    """
+    Compute ProductivityStats over a process pool.
+
+    The messages, a list or a stream such as iter_messages, are cut into
+    chunks of chunk_size. Each worker counts one chunk at a time and the
+    partial totals are merged back in message order. The sum of
+    per-message word-length averages is added up per shard, so it can
+    differ from a single pass in the last floating-point digits.
+
+    Parameters
+    ----------
+    messages : iterable of strings
+        The messages.
+    processes : int, optional
+        Worker processes; defaults to the number of CPUs.
+    chunk_size : int, optional
+        Messages per task.
+
+    Returns
+    -------
+    ProductivityStats
+    """
+    import multiprocessing
+
+    stats = ProductivityStats()
+    with multiprocessing.Pool(processes) as pool:
+        for partial in pool.imap(ProductivityStats, iter_chunks(messages, chunk_size)):
+            stats.merge(partial)
+    return stats
+
+def sharded_search_messages(messages, search_term, is_case_sensitive, processes=None, chunk_size=10000):
+    """
+    search_messages over a process pool, with the same result.
+
+    Each worker searches one chunk; the message numbers it reports are
+    shifted by the chunk's position before the lists are joined.
+    """
+    import multiprocessing
+    from functools import partial
+
+    messages_index = []
+    in_messages_index = []
+    offset = 0
+    task = partial(search_chunk, search_term=search_term, is_case_sensitive=is_case_sensitive)
+    with multiprocessing.Pool(processes) as pool:
+        for size, (chunk_index, chunk_positions) in pool.imap(task, iter_chunks(messages, chunk_size)):
+            messages_index.extend(i + offset for i in chunk_index)
+            in_messages_index.extend(chunk_positions)
+            offset += size
+    return messages_index, in_messages_index
+
+# Saved IncrementalAnalytics files: magic, header length, JSON header, then
+# these sections in order, each a flat array of the given type or, without
+# one, a block of UTF-8 text; offsets are 64-bit, message ids and positions
+# in a message 32-bit
+STATE_MAGIC = b'SLACKSTATE'
+STATE_VERSION = 2
+STATE_SECTIONS = (('message_offsets', 'Q'), ('message_text', None), ('always_check', 'I'),
+                  ('gram_offsets', 'Q'), ('gram_text', None), ('gram_starts', 'Q'), ('gram_ids', 'I'),
+                  ('token_offsets', 'Q'), ('token_text', None), ('token_starts', 'Q'),
+                  ('token_ids', 'I'), ('token_positions', 'I'))
+
+def pack_strings(strings):
+    # strings as one text plus the character offset where each one ends
+    offsets = array('Q', [0])
+    total = 0
+    for string in strings:
+        total += len(string)
+        offsets.append(total)
+    return offsets, ''.join(strings).encode('utf-8')
+
+def unpack_strings(offsets, data):
+    text = str(data, 'utf-8')
+    if offsets[-1] != len(text):
+        raise ValueError('string offsets do not match the text')
+    return [text[offsets[k]:offsets[k + 1]] for k in range(len(offsets) - 1)]
+
+class IncrementalAnalytics:
+    """
+    Analytics state that grows as new messages arrive.
+
+    Holds the running ProductivityStats and a MessageIndex over every
+    message seen so far. New batches are appended without revisiting old
+    messages, and the whole state can be saved and loaded, so a daily job
+    only processes what was added since the last run.
+
+    Parameters
+    ----------
+    messages : iterable of strings, optional
+        The first batch of messages.
+    """
+
+    def __init__(self, messages=()):
+        self.stats = ProductivityStats()
+        self.index = MessageIndex()
+        self.append(messages)
+
+    def __len__(self):
+        return self.stats.num_messages
+
+    def append(self, messages):
+        """
+        Add a batch of new messages to the totals and the search index.
+        """
+        for chunk in iter_chunks(messages, 10000):
+            self.stats.update(chunk)
+            self.index.add_messages(chunk)
+
+    def append_from_file(self, filename):
+        """
+        Add the messages of a grown export that have not been seen yet.
+
+        The export is assumed to only grow at the end, so the first
+        len(self) messages are skipped. They are still parsed, as a stream,
+        but nothing is counted or indexed for them.
+
+        Returns
+        -------
+        int
+            The number of new messages.
+        """
+        before = len(self)
+        self.append(islice(iter_messages(filename), before, None))
+        return len(self) - before
+
+    def search(self, search_term, is_case_sensitive):
+        return self.index.search(search_term, is_case_sensitive)
+
+    def print_report(self):
+        self.stats.print_report()
+
+    def save(self, path):
+        """
+        Save the state to path, replacing any earlier save atomically.
+
+        The file holds plain data only: a JSON header with the report
+        totals and tag counts, then the messages and both search index
+        postings as flat arrays with offsets tables, like the message
+        cache. load reads the index back instead of rebuilding it.
+        """
+        index = self.index
+        sections = {}
+        sections['message_offsets'], sections['message_text'] = pack_strings(index.messages)
+        sections['always_check'] = array('I', index.always_check)
+
+        # postings end to end, with where each key's list starts
+        gram_starts = array('Q', [0])
+        gram_ids = array('I')
+        for posting in index.grams.values():
+            gram_ids.extend(posting)
+            gram_starts.append(len(gram_ids))
+        sections['gram_offsets'], sections['gram_text'] = pack_strings(index.grams)
+        sections['gram_starts'] = gram_starts
+        sections['gram_ids'] = gram_ids
+
+        token_starts = array('Q', [0])
+        token_ids = array('I')
+        token_positions = array('I')
+        for posting in index.tokens.values():
+            for i, k in posting:
+                token_ids.append(i)
+                token_positions.append(k)
+            token_starts.append(len(token_ids))
+        sections['token_offsets'], sections['token_text'] = pack_strings(index.tokens)
+        sections['token_starts'] = token_starts
+        sections['token_ids'] = token_ids
+        sections['token_positions'] = token_positions
+
+        blocks = [data if isinstance(data, bytes) else data.tobytes() for data in sections.values()]
+        header = {'version': STATE_VERSION,
+                  'num_messages': self.stats.num_messages,
+                  'total_words': self.stats.total_words,
+                  'total_avg_word_length': self.stats.total_avg_word_length,
+                  # a list of pairs keeps the tags in first-seen order
+                  'tag_counts': list(self.stats.tag_counts.items()),
+                  'n': index.n,
+                  'sections': {name: len(block) for name, block in zip(sections, blocks)}}
+        raw = json.dumps(header).encode('utf-8')
+
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(STATE_MAGIC)
+            f.write(array('Q', [len(raw)]).tobytes())
+            f.write(raw)
+            for block in blocks:
+                f.write(block)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a state written by save.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        try:
+            if not data.startswith(STATE_MAGIC):
+                raise ValueError
+            position = len(STATE_MAGIC)
+            size = array('Q', data[position:position + 8])[0]
+            position += 8
+            header = json.loads(data[position:position + size].decode('utf-8'))
+            position += size
+            if header['version'] != STATE_VERSION:
+                raise ValueError
+
+            view = memoryview(data)
+            sections = {}
+            for name, typecode in STATE_SECTIONS:
+                size = header['sections'][name]
+                if position + size > len(data):
+                    raise ValueError
+                block = view[position:position + size]
+                if typecode is None:
+                    sections[name] = block
+                else:
+                    sections[name] = array(typecode)
+                    sections[name].frombytes(block)
+                position += size
+
+            messages = unpack_strings(sections['message_offsets'], sections['message_text'])
+            grams = unpack_strings(sections['gram_offsets'], sections['gram_text'])
+            tokens = unpack_strings(sections['token_offsets'], sections['token_text'])
+            gram_starts = sections['gram_starts']
+            token_starts = sections['token_starts']
+            if len(gram_starts) != len(grams) + 1 or len(token_starts) != len(tokens) + 1:
+                raise ValueError
+            gram_ids = sections['gram_ids'].tolist()
+            token_postings = list(zip(sections['token_ids'].tolist(), sections['token_positions'].tolist()))
+            if gram_starts[-1] != len(gram_ids) or token_starts[-1] != len(token_postings):
+                raise ValueError
+        except (ValueError, KeyError, IndexError, TypeError):
+            raise ValueError(f'{path} does not hold saved analytics') from None
+
+        state = cls()
+        state.stats.num_messages = header['num_messages']
+        state.stats.total_words = header['total_words']
+        state.stats.total_avg_word_length = header['total_avg_word_length']
+        state.stats.tag_counts = Counter(dict(header['tag_counts']))
+
+        index = MessageIndex(n=header['n'])
+        index.messages = messages
+        index.always_check = sections['always_check'].tolist()
+        index.grams = {gram: gram_ids[gram_starts[k]:gram_starts[k + 1]] for k, gram in enumerate(grams)}
+        index.tokens = {token: token_postings[token_starts[k]:token_starts[k + 1]]
+                        for k, token in enumerate(tokens)}
+        state.index = index
+        return state
+
+def generate_productivity_report(messages, processes=1):
+    # a single streaming pass, so messages may be any iterable; with more
+    # than one process the pass is sharded across a pool
+    if processes == 1:
+        stats = ProductivityStats(messages)
+    else:
+        stats = sharded_productivity_stats(messages, processes)
+    stats.print_report()
 
 
 
 if __name__ == '__main__':
-	# Retrieve all the messages from the XML file.
-	messages = load_messages('merged-pythondev-help.xml')
+	# Stream the messages from the XML file.
+	messages = iter_messages('merged-pythondev-help.xml')
 
 	generate_productivity_report(messages)
\ No newline at end of file
@@ -0,0 +1,179 @@
+"""
+Benchmarks for the message analytics in project_b.
+
+Generates a synthetic Slack-style XML export, runs each analytics function
+over it and reports throughput (messages/sec and MB/sec of text) and peak
+memory. Results are written as JSON so runs can be compared:
+
+    python project_b_benchmark.py --messages 100000 --output before.json
+    python project_b_benchmark.py --messages 100000 --compare before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+from xml.sax.saxutils import escape
+
+import project_b
+
+# Vocabulary the generated messages are drawn from
+WORDS = ('the', 'a', 'to', 'is', 'it', 'in', 'I', 'how', 'do', 'you', 'python', 'list', 'dict',
+         'error', 'import', 'function', 'class', 'return', 'value', 'string', 'Thanks', 'help',
+         'TypeError', 'numpy', 'pandas', 'loop', 'index', 'file', 'script', 'install', 'pip')
+
+def generate_slack_xml(path, num_messages, tag_density=0.2, words_per_message=12, num_users=500, seed=0):
+    """
+    Write a synthetic Slack export in the layout load_messages reads.
+
+    Parameters
+    ----------
+    path : string
+        The XML file to write.
+    num_messages : int
+        Number of messages.
+    tag_density : float, optional
+        Probability that any given word is a <@user> tag.
+    words_per_message : int, optional
+        Mean number of words per message; lengths vary uniformly from 1 to
+        twice this.
+    num_users : int, optional
+        Number of distinct users that can be tagged.
+    seed : int, optional
+        Seed for the random generator.
+    """
+    rng = random.Random(seed)
+    users = [f'U{rng.getrandbits(40):010X}' for _ in range(num_users)]
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>\n<messages>\n')
+        for i in range(num_messages):
+            words = []
+            for _ in range(rng.randint(1, 2 * words_per_message)):
+                if rng.random() < tag_density:
+                    words.append(f'<@{rng.choice(users)}>')
+                else:
+                    words.append(rng.choice(WORDS))
+            f.write(f'<message><user>{rng.choice(users)}</user><ts>{i}</ts>'
+                    f'<text>{escape(" ".join(words))}</text></message>\n')
+        f.write('</messages>\n')
+
+def measure(function, setup=None):
+    """
+    Time one call of function, then measure its peak memory in a second call.
+
+    setup, if given, is called before each run and its result passed to
+    function, so per-run preparation such as copying inputs is not counted.
+
+    Returns
+    -------
+    seconds, peak_bytes : float, int
+    """
+    arguments = (setup(),) if setup else ()
+    start = time.perf_counter()
+    function(*arguments)
+    seconds = time.perf_counter() - start
+
+    # tracemalloc slows the code down, so memory gets a run of its own
+    arguments = (setup(),) if setup else ()
+    tracemalloc.start()
+    function(*arguments)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+def run_benchmarks(path, search_term='python'):
+    """
+    Benchmark the project_b functions on an XML export.
+
+    Returns
+    -------
+    dict
+        For each function, its seconds, messages/sec, MB/sec and peak memory
+        in MB. Loaders are measured against the file size, the others
+        against the UTF-8 size of the message texts.
+    """
+    messages = project_b.load_messages(path)
+    num_messages = len(messages)
+    file_mb = os.path.getsize(path) / 1e6
+    text_mb = sum(len(msg.encode('utf-8')) for msg in messages) / 1e6
+
+    cases = {
+        'load_messages': (lambda: project_b.load_messages(path), None, file_mb),
+        'iter_messages': (lambda: sum(1 for _ in project_b.iter_messages(path)), None, file_mb),
+        'search_messages': (lambda: project_b.search_messages(messages, search_term, False), None, text_mb),
+        'replace_search_word_in_messages': (
+            lambda copy: project_b.replace_search_word_in_messages(copy, search_term, '***', False),
+            lambda: list(messages), text_mb),
+        'count_tagged_people': (lambda: project_b.count_tagged_people(messages), None, text_mb),
+        'generate_productivity_report': (lambda: quietly(project_b.generate_productivity_report, messages),
+                                         None, text_mb),
+    }
+
+    results = {}
+    for name, (function, setup, megabytes) in cases.items():
+        seconds, peak = measure(function, setup)
+        results[name] = {'seconds': seconds,
+                         'messages_per_sec': num_messages / seconds,
+                         'mb_per_sec': megabytes / seconds,
+                         'peak_mb': peak / 1e6}
+    return results
+
+def quietly(function, *args):
+    # runs a function that prints, discarding its output
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args)
+
+def print_results(results, baseline=None):
+    header = f'{"function":<34}{"seconds":>10}{"msg/s":>12}{"MB/s":>9}{"peak MB":>10}'
+    if baseline:
+        header += f'{"speedup":>9}'
+    print(header)
+    for name, row in results.items():
+        line = (f'{name:<34}{row["seconds"]:>10.3f}{row["messages_per_sec"]:>12.0f}'
+                f'{row["mb_per_sec"]:>9.2f}{row["peak_mb"]:>10.2f}')
+        if baseline and name in baseline:
+            line += f'{baseline[name]["seconds"] / row["seconds"]:>8.2f}x'
+        print(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the project_b message analytics.')
+    parser.add_argument('--messages', type=int, default=50000, help='messages to generate (default 50000)')
+    parser.add_argument('--tag-density', type=float, default=0.2, help='chance a word is a tag (default 0.2)')
+    parser.add_argument('--words', type=int, default=12, help='mean words per message (default 12)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--xml', help='benchmark this export instead of generating one')
+    parser.add_argument('--search-term', default='python')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of an earlier run to compare against')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = args.xml
+        if path is None:
+            path = os.path.join(directory, 'benchmark.xml')
+            generate_slack_xml(path, args.messages, args.tag_density, args.words, seed=args.seed)
+        results = run_benchmarks(path, args.search_term)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    print_results(results, baseline)
+
+    if args.output:
+        record = {'settings': vars(args),
+                  'python': platform.python_version(),
+                  'machine': platform.machine(),
+                  'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                  'results': results}
+        with open(args.output, 'w') as f:
+            json.dump(record, f, indent=2)
+
+if __name__ == '__main__':
+    main()
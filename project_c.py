@@ -1,12 +1,25 @@
 # -*- coding: utf-8 -*-
 
 
+import csv
+import json
 import math
+import os
+import sys
+import time
+import zipfile
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+import numpy as np
 
 
 
 class Plant:
     
+    #slots keep each plant small: no per-object __dict__
+    __slots__ = ("name", "symbol", "size", "preferred_ph", "preferred_soil", "sun_requirements")
+    
     def __init__(self, name, symbol, size, preferred_ph, preferred_soil, sun_requirements):
         self.name = name
         self.symbol = symbol
@@ -18,14 +31,70 @@ class Plant:
         return f'{self.symbol} ({self.size}x{self.size})'
         
 
+class SpeciesPlant(Plant):
+    
+    #a catalogue's copy of a species, shared by every row that holds the
+    #species, so it is read-only: changing it would change all of them
+    
+    __slots__ = ()
+    
+    def __init__(self, name, symbol, size, preferred_ph, preferred_soil, sun_requirements):
+        for field, value in zip(Plant.__slots__, (name, symbol, size, preferred_ph,
+                                                  frozenset(preferred_soil), sun_requirements)):
+            object.__setattr__(self, field, value)
+            
+    def __setattr__(self, name, value):
+        raise AttributeError(f"cannot set {name}: catalogue plants are shared and read-only")
+        
+    def __delattr__(self, name):
+        raise AttributeError(f"cannot delete {name}: catalogue plants are shared and read-only")
+        
+
+class PlantCatalogue:
+    
+    #species data held once: each distinct (name, symbol, size, pH, soil,
+    #sun) gets an ID and one shared Plant, so placed plants only need the ID
+    
+    def __init__(self):
+        self.species = []
+        self.ids = {}
+        
+    def __len__(self):
+        return len(self.species)
+        
+    def species_id(self, plant):
+        #ID of the plant's species, adding the species if it is new
+        key = (plant.name, plant.symbol, plant.size, plant.preferred_ph,
+               frozenset(plant.preferred_soil), plant.sun_requirements)
+        species_id = self.ids.get(key)
+        if species_id is None:
+            species_id = len(self.species)
+            self.ids[key] = species_id
+            #a read-only copy, so later changes to the caller's plant don't
+            #leak in and the shared copy can't be changed through a row
+            self.species.append(SpeciesPlant(*key))
+        return species_id
+        
+    def plant(self, species_id):
+        return self.species[species_id]
+
+
+#catalogue used by every row unless another one is given
+PLANT_CATALOGUE = PlantCatalogue()
+
+
 class GardenRow:
-    def __init__(self, max_length, max_width):
-        self.plants = []
+    def __init__(self, max_length, max_width, catalogue=None):
+        #species IDs of the plants, in order; see the plants property
+        self.catalogue = PLANT_CATALOGUE if catalogue is None else catalogue
+        self.plant_ids = array("I")
         self.max_length = max_length
         self.max_width = max_width
         self.current_length = 0
         self.current_width = 0
         self.finalised = False
+        #rendered lines, kept until the next plant is added
+        self._lines = None
 
     def can_add_plant(self, plant):
         if self.finalised:
@@ -36,45 +105,60 @@ class GardenRow:
             return False
         return True
 
+    @property
+    def plants(self):
+        #the row's plants, as the catalogue's shared, read-only Plant of each
+        #species; a tuple, since plants are only added through add_plant
+        species = self.catalogue.species
+        return tuple(species[species_id] for species_id in self.plant_ids)
+
     def add_plant(self, plant):
         if self.can_add_plant(plant):
-            self.plants.append(plant)
+            self.plant_ids.append(self.catalogue.species_id(plant))
+            self._lines = None
             self.current_length += plant.size
             self.current_width = max(self.current_width, plant.size)
             return True
         return False
 
+    def lines(self):
+        #one line per unit of height, each plant drawn size x size
+        if self._lines is None:
+            plants = self.plants
+            lines = []
+            for i in range(1, self.current_width + 1):
+                row_str = "".join(plant.symbol * plant.size if plant.size >= i else " " * plant.size
+                                  for plant in plants)
+                # pad to full width
+                lines.append("|" + row_str.ljust(self.max_length) + "|")
+            self._lines = lines
+        return self._lines
+
     def __str__(self):
-        lines = []
-        for i in range(1, self.current_width + 1):
-            row_str = ""
-            for plant in self.plants:
-                if plant.size >= i:
-                    row_str += plant.symbol * plant.size
-                else:
-                    row_str += " " * plant.size
-            # pad to full width
-            if len(row_str) < self.max_length:
-                row_str += " " * (self.max_length - len(row_str))
-            lines.append("|" + row_str + "|")
-        return "\n".join(lines) + "\n"
+        return "\n".join(self.lines()) + "\n"
                     
          
     
 class GardenBed:
     
     
-    def __init__(self, length, width, ph, soil_type, sun_amount):
+    def __init__(self, length, width, ph, soil_type, sun_amount, catalogue=None):
         self.length = length
         self.width = width
         self.ph = ph
         self.soil_type = soil_type
         self.sun_amount = sun_amount
-        self.rows_of_plants = [GardenRow(length, width)]
+        self.catalogue = PLANT_CATALOGUE if catalogue is None else catalogue
+        self.rows_of_plants = [GardenRow(length, width, self.catalogue)]
+        #rendered bed, kept until the next plant is added
+        self._text = None
         self.id = None        
+        #top left corner in the garden, once placed
+        self.x = None
+        self.y = None
     
     
-    def can_be_planted_here(self, plant):
+    def is_compatible(self, plant):
         #checks sun requirements
         if self.sun_amount != plant.sun_requirements:
             return False
@@ -84,6 +168,13 @@ class GardenBed:
         #Checks if pH meets (within 1.5)
         if abs(self.ph - plant.preferred_ph) > 1.5:
             return False
+        return True
+    
+    
+    def can_be_planted_here(self, plant):
+        #checks sun, soil and pH
+        if not self.is_compatible(plant):
+            return False
         #Checks is there is room
         if not self.is_enough_room(plant):
             return False
@@ -109,6 +200,7 @@ class GardenBed:
     def add_plant(self, plant):
         if not self.can_be_planted_here(plant):
             return False
+        self._text = None
 
         current_row = self.rows_of_plants[-1]
        
@@ -127,7 +219,7 @@ class GardenBed:
         #finalises current row
         current_row.finalised = True
         current_row.max_width = current_row.current_width
-        new_row = GardenRow(self.length, remaining_height)
+        new_row = GardenRow(self.length, remaining_height, self.catalogue)
        
         #adds the plant to the row
         new_row.add_plant(plant)
@@ -137,78 +229,617 @@ class GardenBed:
         return True        
             
 
+    def add_plants(self, plants):
+        #places many plants at once with first-fit decreasing shelf packing:
+        #plants go in largest first, each into the first row with room left,
+        #and a new row (as tall as its first, largest plant) is only opened
+        #when none has room; unlike add_plant, earlier rows stay open until
+        #every plant has been tried, so small plants fill the gaps they left
+        result = PlacementResult(self)
+        self._text = None
+        
+        fitting = []
+        for plant in plants:
+            if self.is_compatible(plant):
+                fitting.append(plant)
+            else:
+                result.rejected.append(plant)
+        fitting.sort(key=lambda plant: plant.size, reverse=True)
+        
+        #rows that can still take plants: only the last one can grow taller
+        first_open = len(self.rows_of_plants) - 1
+        if self.rows_of_plants[-1].finalised:
+            first_open += 1
+        closed_height = sum(row.current_width for row in self.rows_of_plants[:first_open])
+        
+        for plant in fitting:
+            placed = False
+            for k in range(first_open, len(self.rows_of_plants)):
+                row = self.rows_of_plants[k]
+                if row.current_length + plant.size > row.max_length:
+                    continue
+                if plant.size <= row.current_width or k == len(self.rows_of_plants) - 1:
+                    #the last row may grow into the free height below it
+                    above = closed_height + sum(r.current_width for r in self.rows_of_plants[first_open:k])
+                    if plant.size > self.width - above:
+                        continue
+                    row.max_width = self.width - above
+                    row.add_plant(plant)
+                    placed = True
+                    break
+            
+            if not placed:
+                used_height = sum(row.current_width for row in self.rows_of_plants)
+                if plant.size > self.width - used_height or plant.size > self.length:
+                    result.rejected.append(plant)
+                    continue
+                new_row = GardenRow(self.length, self.width - used_height, self.catalogue)
+                new_row.add_plant(plant)
+                self.rows_of_plants.append(new_row)
+            result.placed.append(plant)
+        
+        #leaves the rows as add_plant would: all but the last finalised
+        above = 0
+        for row in self.rows_of_plants[:-1]:
+            row.finalised = True
+            row.max_width = row.current_width
+            above += row.current_width
+        self.rows_of_plants[-1].max_width = self.width - above
+        
+        return result
+    
+    
+    def used_area(self):
+        #spots covered by plants, each plant taking size x size
+        species = self.catalogue.species
+        return sum(species[species_id].size ** 2 for row in self.rows_of_plants for species_id in row.plant_ids)
+    
+    
+    def utilisation(self):
+        #fraction of the bed covered by plants
+        area = self.length * self.width
+        return self.used_area() / area if area > 0 else 0.0
+    
+    
     def __str__(self):
+        if self._text is not None:
+            return self._text
         lines = []
         lines.append("+" + "-" * self.length + "+")
         for i, row in enumerate(self.rows_of_plants):
-            #converts each row to string and removes empty lines
-            row_lines = [line for line in str(row).split("\n") if line.strip() != ""]
-            lines.extend(row_lines)
+            #each row's own lines, which it keeps between renders
+            lines.extend(row.lines())
             if i < len(self.rows_of_plants) - 1:
                 #adds separator if needed
                 lines.append("|" + "." * self.length + "|")
         lines.append("+" + "-" * self.length + "+")
-        return "\n".join(lines)    
+        self._text = "\n".join(lines)
+        return self._text
+    
+class RTreeNode:
+    
+    def __init__(self, leaf):
+        self.leaf = leaf
+        #entries are (rectangle, bed) in a leaf, (rectangle, node) otherwise
+        self.entries = []
+        
+    def bounds(self):
+        #smallest rectangle around every entry
+        return (min(e[0][0] for e in self.entries), min(e[0][1] for e in self.entries),
+                max(e[0][2] for e in self.entries), max(e[0][3] for e in self.entries))
+    
+
+def rect_overlaps(a, b):
+    #rectangles are (x0, y0, x1, y1), covering x0 <= x < x1 and y0 <= y < y1
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+def rect_union(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+def rect_area(a):
+    return (a[2] - a[0]) * (a[3] - a[1])
+
+
+class BedIndex:
+    
+    #R-tree of garden bed rectangles
+    #Each node holds at most MAX_ENTRIES rectangles and every internal entry
+    #covers all rectangles below it, so a lookup only descends into the
+    #branches whose rectangle touches the query: logarithmic in the number
+    #of beds for beds that do not overlap
+    
+    MAX_ENTRIES = 8
+    MIN_ENTRIES = 3
+    
+    def __init__(self):
+        self.root = RTreeNode(leaf=True)
+        self.size = 0
+        
+    def __len__(self):
+        return self.size
+        
+    def insert(self, rect, bed):
+        split = self._insert(self.root, rect, bed)
+        if split is not None:
+            #the root was split, so the tree grows a level
+            old_root = self.root
+            self.root = RTreeNode(leaf=False)
+            self.root.entries = [(old_root.bounds(), old_root), (split.bounds(), split)]
+        self.size += 1
+        
+    def bulk_load(self, entries):
+        #builds the tree from (rectangle, bed) pairs in one go, sort-tile-
+        #recursive: entries are sorted into vertical slices by x, each slice
+        #by y, and packed MAX_ENTRIES to a node, then the same for each level
+        #above; much faster than inserting one at a time
+        self.size = len(entries)
+        if not entries:
+            self.root = RTreeNode(leaf=True)
+            return
+        leaf = True
+        while True:
+            nodes = []
+            per_slice = self.MAX_ENTRIES * math.ceil(math.sqrt(math.ceil(len(entries) / self.MAX_ENTRIES)))
+            entries = sorted(entries, key=lambda e: e[0][0] + e[0][2])
+            for start in range(0, len(entries), per_slice):
+                column = sorted(entries[start:start + per_slice], key=lambda e: e[0][1] + e[0][3])
+                for k in range(0, len(column), self.MAX_ENTRIES):
+                    node = RTreeNode(leaf)
+                    node.entries = column[k:k + self.MAX_ENTRIES]
+                    nodes.append(node)
+            if len(nodes) == 1:
+                self.root = nodes[0]
+                return
+            entries = [(node.bounds(), node) for node in nodes]
+            leaf = False
+        
+    def _insert(self, node, rect, bed):
+        #adds the entry below node, returning the new sibling if node split
+        if node.leaf:
+            node.entries.append((rect, bed))
+        else:
+            #descends into the child that has to grow least
+            best = min(range(len(node.entries)),
+                       key=lambda k: (rect_area(rect_union(node.entries[k][0], rect))
+                                      - rect_area(node.entries[k][0]),
+                                      rect_area(node.entries[k][0])))
+            child = node.entries[best][1]
+            split = self._insert(child, rect, bed)
+            node.entries[best] = (child.bounds(), child)
+            if split is not None:
+                node.entries.append((split.bounds(), split))
+        
+        if len(node.entries) > self.MAX_ENTRIES:
+            return self._split(node)
+        return None
+        
+    def _split(self, node):
+        #quadratic split: seeds are the pair that would waste most area
+        entries = node.entries
+        #waste can be negative when rectangles overlap, so any pair beats
+        #the starting value
+        worst = -math.inf
+        for i in range(len(entries)):
+            for j in range(i + 1, len(entries)):
+                waste = (rect_area(rect_union(entries[i][0], entries[j][0]))
+                         - rect_area(entries[i][0]) - rect_area(entries[j][0]))
+                if waste > worst:
+                    worst = waste
+                    seeds = (i, j)
+        
+        groups = [[entries[seeds[0]]], [entries[seeds[1]]]]
+        boxes = [entries[seeds[0]][0], entries[seeds[1]][0]]
+        rest = [e for k, e in enumerate(entries) if k not in seeds]
+        
+        while rest:
+            #tops up a group that needs every remaining entry to reach the minimum
+            for g in (0, 1):
+                if len(groups[g]) + len(rest) == self.MIN_ENTRIES:
+                    groups[g].extend(rest)
+                    rest = []
+            if not rest:
+                break
+            entry = rest.pop()
+            growth = [rect_area(rect_union(boxes[g], entry[0])) - rect_area(boxes[g]) for g in (0, 1)]
+            g = 0 if (growth[0], len(groups[0])) <= (growth[1], len(groups[1])) else 1
+            groups[g].append(entry)
+            boxes[g] = rect_union(boxes[g], entry[0])
+        
+        node.entries = groups[0]
+        sibling = RTreeNode(node.leaf)
+        sibling.entries = groups[1]
+        return sibling
+        
+    def search(self, rect):
+        #beds whose rectangles overlap rect
+        found = []
+        stack = [self.root] if self.size else []
+        while stack:
+            node = stack.pop()
+            for entry_rect, item in node.entries:
+                if rect_overlaps(entry_rect, rect):
+                    if node.leaf:
+                        found.append(item)
+                    else:
+                        stack.append(item)
+        return found
+        
+    def overlaps(self, rect):
+        #whether any bed overlaps rect, stopping at the first one found
+        stack = [self.root] if self.size else []
+        while stack:
+            node = stack.pop()
+            for entry_rect, item in node.entries:
+                if rect_overlaps(entry_rect, rect):
+                    if node.leaf:
+                        return True
+                    stack.append(item)
+        return False
     
+
+class PlacementResult:
+    
+    #outcome of GardenBed.add_plants
+    
+    def __init__(self, bed):
+        self.bed = bed
+        self.placed = []
+        self.rejected = []
+        
+    def utilisation(self):
+        #fraction of the bed covered by plants after placement
+        return self.bed.utilisation()
+        
+    def __str__(self):
+        return (f'{len(self.placed)} plants placed, {len(self.rejected)} rejected, '
+                f'{self.utilisation():.1%} of the bed used')
+        
+
 class Garden:
     
     def __init__(self, length, width):
         self.length = length
         self.width = width
-        self.spots = [[None for i in range(length)] for j in range(width)]
+        #occupancy grid: 0 for an empty spot, otherwise the bed's id + 1;
+        #None until first needed after a load, see the occupancy property
+        self._occupancy = np.zeros((width, length), dtype=np.uint16)
         self.next_bed_id = 0
         self.beds = []        
+        #R-tree of bed rectangles for overlap and position lookups
+        self.bed_index = BedIndex()
+        #compatibility index: bed IDs by sun amount and by soil type, and
+        #(pH, ID) pairs kept sorted by pH
+        self.beds_by_sun = {}
+        self.beds_by_soil = {}
+        self.beds_by_ph = []
+        #rendered grid lines and their cell width, patched by add_bed
+        self._render_lines = None
+        self._render_cell_width = None
+        self._render_text = None
+        
+    @property
+    def occupancy(self):
+        #a loaded garden paints its grid from the beds on first use, so
+        #loading costs nothing per spot
+        if self._occupancy is None:
+            dtype = np.uint16 if self.next_bed_id < np.iinfo(np.uint16).max else np.uint32
+            grid = np.zeros((self.width, self.length), dtype=dtype)
+            for bed in self.beds:
+                #a negative size would slice from the far edge instead
+                if bed.length > 0 and bed.width > 0:
+                    grid[bed.y:bed.y + bed.width, bed.x:bed.x + bed.length] = bed.id + 1
+            self._occupancy = grid
+        return self._occupancy
+        
+    @occupancy.setter
+    def occupancy(self, grid):
+        self._occupancy = grid
         
+    @property
+    def spots(self):
+        #the grid as rows of bed objects (None where empty), built on request
+        lookup = [None] + self.beds
+        return [[lookup[cell] for cell in row] for row in self.occupancy.tolist()]
         
     def add_bed(self, new_bed, x, y):
         if x < 0 or y < 0:
             return False
-        if len(self.beds) >= 10:
-            return False
         #checks if out of bounds
         if x + new_bed.length > self.length or y + new_bed.width > self.width:
             return False
         #checks if the location is empty for the bed (no overlap)
-        for row in range(y, y + new_bed.width):
-            for col in range(x, x + new_bed.length):
-                if self.spots[row][col] is not None:
-                    return False
+        #a bed without area covers no spots, so it cannot overlap
+        rect = (x, y, x + new_bed.length, y + new_bed.width)
+        has_area = new_bed.length > 0 and new_bed.width > 0
+        if has_area and self.bed_index.overlaps(rect):
+            return False
         #assigns a id, makes the next id different
         new_bed.id = self.next_bed_id
         self.next_bed_id += 1
-        #placing the bed down
-        for row in range(y, y + new_bed.width):
-            for col in range(x, x + new_bed.length):
-                self.spots[row][col] = new_bed
+        #placing the bed down, unless the grid has yet to be built
+        if self._occupancy is not None:
+            #widens the grid type before ids stop fitting
+            if new_bed.id + 1 > np.iinfo(self._occupancy.dtype).max:
+                self._occupancy = self._occupancy.astype(np.uint32)
+            #a bed without area covers nothing; a negative size would
+            #otherwise slice from the far edge of the grid
+            if has_area:
+                self._occupancy[y:y + new_bed.width, x:x + new_bed.length] = new_bed.id + 1
+        new_bed.x = x
+        new_bed.y = y
+        self.index_bed(new_bed)
+        insort(self.beds_by_ph, (new_bed.ph, new_bed.id))
 
         self.beds.append(new_bed)
+        
+        #only the grid lines under the new bed change, unless every cell
+        #just got wider
+        self._render_text = None
+        if self._render_lines is not None:
+            if self.cell_width() != self._render_cell_width:
+                self._render_lines = None
+            elif has_area:
+                self._render_lines[y:y + new_bed.width] = self.render_rows(y, y + new_bed.width,
+                                                                          self._render_cell_width)
 
         return True                
 
+    def index_bed(self, bed):
+        #adds a placed bed to the R-tree and the sun and soil buckets
+        if bed.length > 0 and bed.width > 0:
+            self.bed_index.insert((bed.x, bed.y, bed.x + bed.length, bed.y + bed.width), bed)
+        self.bucket_bed(bed)
+        
+    def bucket_bed(self, bed):
+        self.beds_by_sun.setdefault(bed.sun_amount, set()).add(bed.id)
+        for soil in bed.soil_type:
+            self.beds_by_soil.setdefault(soil, set()).add(bed.id)
+        
+    def save(self, path):
+        #writes the whole garden to an .npz file as columns: one array per
+        #bed, row and species field, plus the plants' species IDs end to
+        #end. The grid is not stored; load rebuilds it from the beds
+        strings = {}
+        def string_id(value):
+            return strings.setdefault(value, len(strings))
+        
+        #only the species that are actually planted, renumbered from 0
+        species_index = {}
+        row_beds, row_fields, row_sizes, plant_ids = [], [], [], []
+        for bed in self.beds:
+            for row in bed.rows_of_plants:
+                ids = [species_index.setdefault((bed.catalogue, species_id), len(species_index))
+                       for species_id in row.plant_ids]
+                row_beds.append(bed.id)
+                row_fields.append((row.max_length, row.max_width, row.current_length,
+                                   row.current_width, row.finalised))
+                row_sizes.append(len(ids))
+                plant_ids.extend(ids)
+        species = [catalogue.plant(species_id) for catalogue, species_id in species_index]
+        
+        #soil sets become string IDs end to end with a count per owner
+        bed_soils = [sorted(bed.soil_type) for bed in self.beds]
+        species_soils = [sorted(plant.preferred_soil) for plant in species]
+        columns = {
+            "garden": np.array([self.length, self.width, self.next_bed_id], dtype=np.int64),
+            "bed_ids": np.array([bed.id for bed in self.beds], dtype=np.int64),
+            "bed_boxes": np.array([(bed.x, bed.y, bed.length, bed.width) for bed in self.beds],
+                                  dtype=np.int64).reshape(-1, 4),
+            "bed_ph": np.array([bed.ph for bed in self.beds], dtype=np.float64),
+            "bed_sun": np.array([string_id(bed.sun_amount) for bed in self.beds], dtype=np.int64),
+            "bed_soil_counts": np.array([len(soils) for soils in bed_soils], dtype=np.int64),
+            "bed_soils": np.array([string_id(soil) for soils in bed_soils for soil in soils], dtype=np.int64),
+            "row_beds": np.array(row_beds, dtype=np.int64),
+            "row_fields": np.array(row_fields, dtype=np.int64).reshape(-1, 5),
+            "row_sizes": np.array(row_sizes, dtype=np.int64),
+            "plant_species": np.array(plant_ids, dtype=np.uint32),
+            "species_text": np.array([(string_id(plant.name), string_id(plant.symbol), string_id(plant.sun_requirements))
+                                      for plant in species], dtype=np.int64).reshape(-1, 3),
+            "species_size": np.array([plant.size for plant in species], dtype=np.int64),
+            "species_ph": np.array([plant.preferred_ph for plant in species], dtype=np.float64),
+            "species_soil_counts": np.array([len(soils) for soils in species_soils], dtype=np.int64),
+            "species_soils": np.array([string_id(soil) for soils in species_soils for soil in soils],
+                                      dtype=np.int64),
+        }
+        columns["strings"] = np.array(list(strings), dtype=str)
+        #written beside the old snapshot and swapped in, so an interrupted
+        #save leaves the previous one intact
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as f:
+            np.savez_compressed(f, **columns)
+        os.replace(temporary, path)
+        
+    @classmethod
+    def load(cls, path, catalogue=None):
+        #reads a garden written by save, in time proportional to its beds,
+        #rows and plants; the grid is only built when something needs it
+        with np.load(path, allow_pickle=False) as data:
+            columns = {name: data[name] for name in data.files}
+        strings = columns["strings"].tolist()
+        catalogue = PLANT_CATALOGUE if catalogue is None else catalogue
+        
+        def split_soils(counts, soils):
+            ends = np.cumsum(counts).tolist()
+            soils = soils.tolist()
+            return [{strings[k] for k in soils[end - count:end]} for count, end in zip(counts.tolist(), ends)]
+        
+        #saved species IDs are mapped onto the catalogue's own
+        species_soils = split_soils(columns["species_soil_counts"], columns["species_soils"])
+        species_map = np.array([catalogue.species_id(Plant(strings[name], strings[symbol], size, ph,
+                                                           soils, strings[sun]))
+                                for (name, symbol, sun), size, ph, soils in
+                                zip(columns["species_text"].tolist(), columns["species_size"].tolist(),
+                                    columns["species_ph"].tolist(), species_soils)],
+                               dtype=np.uint32)
+        plant_ids = species_map[columns["plant_species"]] if len(species_map) else columns["plant_species"]
+        
+        length, width, next_bed_id = columns["garden"].tolist()
+        garden = cls(length, width)
+        garden._occupancy = None
+        garden.next_bed_id = next_bed_id
+        
+        bed_soils = split_soils(columns["bed_soil_counts"], columns["bed_soils"])
+        for bed_id, (x, y, bed_length, bed_width), ph, sun, soils in zip(
+                columns["bed_ids"].tolist(), columns["bed_boxes"].tolist(), columns["bed_ph"].tolist(),
+                columns["bed_sun"].tolist(), bed_soils):
+            bed = GardenBed(bed_length, bed_width, ph, soils, strings[sun], catalogue)
+            bed.rows_of_plants = []
+            bed.id = bed_id
+            bed.x = x
+            bed.y = y
+            garden.bucket_bed(bed)
+            garden.beds.append(bed)
+        garden.bed_index.bulk_load([((bed.x, bed.y, bed.x + bed.length, bed.y + bed.width), bed)
+                                    for bed in garden.beds if bed.length > 0 and bed.width > 0])
+        garden.beds_by_ph = sorted((bed.ph, bed.id) for bed in garden.beds)
+        
+        start = 0
+        for bed_id, fields, size in zip(columns["row_beds"].tolist(), columns["row_fields"].tolist(),
+                                        columns["row_sizes"].tolist()):
+            max_length, max_width, current_length, current_width, finalised = fields
+            row = GardenRow(max_length, max_width, catalogue)
+            row.plant_ids = array("I", plant_ids[start:start + size].tobytes())
+            row.current_length = current_length
+            row.current_width = current_width
+            row.finalised = bool(finalised)
+            garden.beds[bed_id].rows_of_plants.append(row)
+            start += size
+        return garden
+        
+    def bed_at(self, x, y):
+        #the bed covering spot (x, y), or None
+        found = self.bed_index.search((x, y, x + 1, y + 1))
+        return found[0] if found else None
+        
+    def beds_overlapping(self, x, y, length, width):
+        #every bed that overlaps the given rectangle
+        return self.bed_index.search((x, y, x + length, y + width))
+        
+    def compatible_bed_ids(self, sun, soils, ph):
+        #IDs of beds with this sun amount, a shared soil type and a pH
+        #within 1.5, found from the buckets rather than by visiting every bed
+        sun_ids = self.beds_by_sun.get(sun)
+        if not sun_ids:
+            return []
+        soil_ids = set()
+        for soil in soils:
+            soil_ids.update(self.beds_by_soil.get(soil, ()))
+        candidates = sun_ids & soil_ids if len(sun_ids) < len(soil_ids) else soil_ids & sun_ids
+        if not candidates:
+            return []
+        #pH window from the sorted list, slightly widened against rounding in
+        #ph +- 1.5; each bed in it then gets is_compatible's exact test
+        low = bisect_left(self.beds_by_ph, (ph - 1.5 - 1e-9, -1))
+        high = bisect_right(self.beds_by_ph, (ph + 1.5 + 1e-9, math.inf))
+        if high - low < len(candidates):
+            ids = [bed_id for bed_ph, bed_id in self.beds_by_ph[low:high]
+                   if bed_id in candidates and abs(bed_ph - ph) <= 1.5]
+        else:
+            ids = [bed_id for bed_id in candidates if abs(self.beds[bed_id].ph - ph) <= 1.5]
+        return sorted(ids)
+        
+    def beds_for_plant(self, plant, check_room=True):
+        #every bed the plant can go in, in bed ID order; with check_room it
+        #must also have room, as GardenBed.can_be_planted_here requires
+        beds = [self.beds[bed_id] for bed_id in
+                self.compatible_bed_ids(plant.sun_requirements, plant.preferred_soil, plant.preferred_ph)]
+        if check_room:
+            return [bed for bed in beds if bed.is_enough_room(plant)]
+        return beds
+        
+    def match_catalogue(self, plants, check_room=True):
+        #beds_for_plant for a whole catalogue: plants with the same sun and
+        #soil needs share one bucket lookup and are then filtered by pH
+        #together with NumPy
+        groups = {}
+        for k, plant in enumerate(plants):
+            key = (plant.sun_requirements, frozenset(plant.preferred_soil))
+            groups.setdefault(key, []).append(k)
+        
+        matches = [[] for _ in plants]
+        for (sun, soils), members in groups.items():
+            sun_ids = self.beds_by_sun.get(sun, set())
+            soil_ids = set()
+            for soil in soils:
+                soil_ids.update(self.beds_by_soil.get(soil, ()))
+            ids = np.array(sorted(sun_ids & soil_ids), dtype=np.int64)
+            if len(ids) == 0:
+                continue
+            phs = np.array([self.beds[bed_id].ph for bed_id in ids])
+            for k in members:
+                plant = plants[k]
+                near = ids[np.abs(phs - plant.preferred_ph) <= 1.5]
+                beds = [self.beds[bed_id] for bed_id in near.tolist()]
+                if check_room:
+                    matches[k] = [bed for bed in beds if bed.is_enough_room(plant)]
+                else:
+                    matches[k] = beds
+        return matches
+        
+    def legend(self):
+        #one line per bed: its ID, position and size
+        return "\n".join(f"{bed.id}: at ({bed.x}, {bed.y}), {bed.length}x{bed.width}"
+                         for bed in self.beds)
+        
+    def cell_width(self):
+        #characters per spot: one while every ID is a single digit, otherwise
+        #enough for the longest ID so large gardens stay aligned
+        return len(str(max(self.next_bed_id - 1, 0)))
+        
+    def render_rows(self, start, stop, cell_width):
+        #grid lines start to stop - 1, with left and right boundaries
+        block = self.occupancy[start:stop]
+        #character codes of the beds in these rows: the bed ID, or spaces
+        cells, inverse = np.unique(block, return_inverse=True)
+        labels = [str(cell - 1).rjust(cell_width)[-cell_width:] if cell else " " * cell_width
+                  for cell in cells.tolist()]
+        codes = np.array([[ord(c) for c in label] for label in labels], dtype="<u4")
+        grid = codes[inverse.reshape(block.shape)].reshape(len(block), self.length * cell_width)
+        return ["|" + row.tobytes().decode("utf-32-le") + "|" for row in grid]
+        
+    def render(self, cell_width=None):
+        if cell_width is None:
+            cell_width = self.cell_width()
+        if cell_width != self.cell_width():
+            #a one-off width, not worth caching
+            grid_lines = self.render_rows(0, self.width, cell_width)
+        else:
+            if self._render_text is not None:
+                return self._render_text
+            if self._render_lines is None:
+                self._render_lines = self.render_rows(0, self.width, cell_width)
+                self._render_cell_width = cell_width
+            grid_lines = self._render_lines
+        
+        #top and bottom boundaries around the grid
+        border = "+" + "-" * (self.length * cell_width) + "+"
+        text = "\n".join([border] + grid_lines + [border])
+        if cell_width == self.cell_width():
+            self._render_text = text
+        return text
+        
+    def write_render(self, file, cell_width=None, rows_per_block=None):
+        #writes the render to an open text file a block of rows at a time,
+        #so a huge garden never has to be held as one string
+        if cell_width is None:
+            cell_width = self.cell_width()
+        if rows_per_block is None:
+            #around a million spots per block
+            rows_per_block = max(1, 1000000 // max(self.length, 1))
+        border = "+" + "-" * (self.length * cell_width) + "+"
+        file.write(border + "\n")
+        for start in range(0, self.width, rows_per_block):
+            for line in self.render_rows(start, min(start + rows_per_block, self.width), cell_width):
+                file.write(line + "\n")
+        file.write(border)
+        
+    def save_render(self, path, cell_width=None):
+        #write_render into a new file at path
+        with open(path, "w", encoding="utf-8") as f:
+            self.write_render(f, cell_width)
+
     def __str__(self):
-        lines = []
-        #top boundary
-        lines.append("+" + "-" * self.length + "+")
-       
-        #iterates through each row
-        for row in self.spots:
-           
-            #left boundary
-            line = "|"
-           
-            #adds bed ID, or otherwise a space
-            for spot in row:
-                line += str(spot.id) if spot is not None else " "
-            #right boundary
-            line += "|"
-           
-            #adds completed row to lines list
-            lines.append(line)
-        #bottom boundary
-        lines.append("+" + "-" * self.length + "+")
-       
-        #combine all lines into a single string to be returned
-        return "\n".join(lines)
+        return self.render()
     
 def print_menu():
     print("Please choose from one of the following options: ")
@@ -216,6 +847,8 @@ def print_menu():
     print("print a garden (b)ed")
     print("(a)dd a new garden bed")
     print("add a new p(l)ant")
+    print("(s)ave the garden to a file")
+    print("(o)pen a saved garden")
     print("(q)uit the application")    
     return input()           
  
@@ -238,29 +871,264 @@ def add_new_plant(garden, bed_idx):
         print("Sorry, the plant could not be added")
         
 def add_new_bed(garden):
-    if garden.next_bed_id >= 10:
-        print("Sorry, the Garden is already full")
+    l = int(input("Please enter the length of the garden bed: "))
+    w = int(input("Please enter the width of the garden bed: "))
+    ph = float(input("Please enter the pH of the soil in this garden bed (a number from 0 to 14): "))
+    soil = input("Please enter the characteristics of the soil types in this garden bed (one or more values, separated by commas): ")
+    sun_amt = input("Please enter the amount of sun this garden bed receives (a string): ")
+    
+    soil_set = {word.strip() for word in soil.split(",")}
+    
+    new_bed = GardenBed(l, w, ph, soil_set, sun_amt)
+    
+    x = int(input("Please enter the x coordinate of the top left corner of this garden bed: "))
+    y = int(input("Please enter the y coordinate of the top left corner of this garden bed: "))
+    
+    if (garden.add_bed(new_bed, x, y)):
+        print("Your garden bed has been added successfully")
     else:
-        l = int(input("Please enter the length of the garden bed: "))
-        w = int(input("Please enter the width of the garden bed: "))
-        ph = float(input("Please enter the pH of the soil in this garden bed (a number from 0 to 14): "))
-        soil = input("Please enter the characteristics of the soil types in this garden bed (one or more values, separated by commas): ")
-        sun_amt = input("Please enter the amount of sun this garden bed receives (a string): ")
-        
-        soil_set = {word.strip() for word in soil.split(",")}
-        
-        new_bed = GardenBed(l, w, ph, soil_set, sun_amt)
-        
-        x = int(input("Please enter the x coordinate of the top left corner of this garden bed: "))
-        y = int(input("Please enter the y coordinate of the top left corner of this garden bed: "))
+        print("Sorry, the garden bed could not be added (probably too big, out of bounds or overlapping)")
+
+
+def soil_set(value):
+    #soil types from a list or a comma separated string
+    if isinstance(value, str):
+        value = value.split(",")
+    return {word.strip() for word in value if word.strip()}
+
+def load_spec(path):
+    #reads a garden spec from JSON, or from CSV when the file ends in .csv
+    #JSON: {"length": .., "width": .., "beds": [{"x", "y", "length", "width",
+    #"ph", "soil", "sun"}, ..], "plants": [{"name", "symbol", "size", "ph",
+    #"soil", "sun", optional "count" and "bed"}, ..]}
+    #CSV: a "kind" column of garden, bed or plant, plus the same fields as
+    #columns (soil types separated by commas inside the cell)
+    if not path.lower().endswith(".csv"):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    
+    spec = {"beds": [], "plants": []}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            kind = row.pop("kind").strip().lower()
+            fields = {key: value for key, value in row.items() if value not in (None, "")}
+            if kind == "garden":
+                spec["length"] = int(fields["length"])
+                spec["width"] = int(fields["width"])
+            elif kind == "bed":
+                spec["beds"].append({"x": int(fields["x"]), "y": int(fields["y"]),
+                                     "length": int(fields["length"]), "width": int(fields["width"]),
+                                     "ph": float(fields["ph"]), "soil": fields["soil"], "sun": fields["sun"]})
+            elif kind == "plant":
+                plant = {"name": fields["name"], "symbol": fields["symbol"], "size": int(fields["size"]),
+                         "ph": float(fields["ph"]), "soil": fields["soil"], "sun": fields["sun"],
+                         "count": int(fields.get("count", 1))}
+                if "bed" in fields:
+                    plant["bed"] = int(fields["bed"])
+                spec["plants"].append(plant)
+            else:
+                raise ValueError(f"unknown row kind {kind!r} in {path}")
+    return spec
+
+class ShelfModel:
+    
+    #the open rows of a bed as (length used, height) pairs, for working out
+    #how many plants an add_plants call would take without making one
+    
+    def __init__(self, bed):
+        self.length = bed.length
+        self.width = bed.width
+        rows = bed.rows_of_plants
+        first_open = len(rows) - 1 if not rows[-1].finalised else len(rows)
+        self.closed_height = sum(row.current_width for row in rows[:first_open])
+        self.rows = [[row.current_length, row.current_width] for row in rows[first_open:]]
         
-        if (garden.add_bed(new_bed, x, y)):
-            print("Your garden bed has been added successfully")
+    def fit(self, size, count):
+        #adds up to count plants of one size, following add_plants' rules for
+        #plants given largest first, and returns how many went in
+        placed = 0
+        above = self.closed_height
+        for k, row in enumerate(self.rows):
+            if placed == count:
+                break
+            last = k == len(self.rows) - 1
+            if (size <= row[1] or last) and size <= self.width - above:
+                n = min(count - placed, (self.length - row[0]) // size)
+                if n > 0:
+                    row[0] += n * size
+                    row[1] = max(row[1], size)
+                    placed += n
+            above += row[1]
+        #then new rows as tall as the plant, while there is height left
+        while placed < count and 0 < size <= self.length and size <= self.width - above:
+            n = min(count - placed, self.length // size)
+            self.rows.append([n * size, size])
+            above += size
+            placed += n
+        return placed
+
+
+def plan_garden(spec):
+    #builds the garden a spec describes; returns it with the beds that could
+    #not be placed and the plants that found no room, as (spec entry, count)
+    garden = Garden(spec["length"], spec["width"])
+    
+    placed_beds = []
+    failed_beds = []
+    for entry in spec["beds"]:
+        bed = GardenBed(entry["length"], entry["width"], entry["ph"], soil_set(entry["soil"]), entry["sun"])
+        if garden.add_bed(bed, entry["x"], entry["y"]):
+            placed_beds.append(bed)
+        else:
+            placed_beds.append(None)
+            failed_beds.append(entry)
+    
+    #copies of a species bound for the same bed (or any bed) are grouped,
+    #with their counts added up, so each group needs one Plant and one
+    #bed lookup however the spec lists them; a plant needs a positive size
+    #to take up room, so any other size is reported as not placed
+    groups = {}
+    unplaced = []
+    for entry in spec["plants"]:
+        count = entry.get("count", 1)
+        if entry["size"] <= 0:
+            unplaced.append((entry, count))
+            continue
+        key = (entry["name"], entry["symbol"], entry["size"], entry["ph"],
+               frozenset(soil_set(entry["soil"])), entry["sun"], entry.get("bed"))
+        if key in groups:
+            groups[key][1] += count
         else:
-            print("Sorry, the garden bed could not be added (probably too big or out of bounds)")
+            groups[key] = [entry, count]
+    
+    #plants for a named bed are shared out first, then the rest, largest
+    #species first; candidates[k] are the beds group k may go in
+    order = sorted(groups.values(), key=lambda group: ("bed" not in group[0], -group[0]["size"]))
+    plants = []
+    candidates = []
+    for entry, count in order:
+        plant = Plant(entry["name"], entry["symbol"], entry["size"], entry["ph"],
+                      soil_set(entry["soil"]), entry["sun"])
+        plants.append(plant)
+        if "bed" in entry:
+            target = entry["bed"]
+            bed = placed_beds[target] if 0 <= target < len(placed_beds) else None
+            candidates.append([bed] if bed is not None and bed.is_compatible(plant) else [])
+        else:
+            candidates.append([garden.beds[bed_id] for bed_id in garden.compatible_bed_ids(
+                plant.sun_requirements, plant.preferred_soil, plant.preferred_ph)])
+    remaining = [count for _, count in order]
+    
+    #rounds: the waiting plants are shared out between beds, species by
+    #species in the order above, then every bed gets its whole share in one
+    #add_plants call, so small plants can fill the gaps larger ones leave.
+    #A bed's share is worked out on a model of its rows that packs the way
+    #add_plants does, so it normally takes all of it; anything turned down
+    #(pinned plants can upset the size order) waits for the next round
+    placed_any = True
+    while placed_any and any(remaining):
+        shelves = {}
+        free_area = {}
+        shares = {}
+        for k, plant in enumerate(plants):
+            area = plant.size * plant.size
+            for bed in candidates[k]:
+                if remaining[k] == 0:
+                    break
+                if bed.id not in shelves:
+                    shelves[bed.id] = ShelfModel(bed)
+                    free_area[bed.id] = bed.length * bed.width - bed.used_area()
+                #full beds are skipped without asking the model
+                if free_area[bed.id] < area:
+                    continue
+                take = shelves[bed.id].fit(plant.size, remaining[k])
+                if take:
+                    free_area[bed.id] -= take * area
+                    remaining[k] -= take
+                    shares.setdefault(bed.id, []).append((k, take))
+        
+        placed_any = False
+        for bed_id, share in shares.items():
+            batch = []
+            for k, take in share:
+                batch.extend([plants[k]] * take)
+            result = garden.beds[bed_id].add_plants(batch)
+            placed_any = placed_any or len(result.placed) > 0
+            #copies share one Plant object per group, so turned down plants
+            #are matched back to their group by identity
+            group = {id(plants[k]): k for k, _ in share}
+            for plant in result.rejected:
+                remaining[group[id(plant)]] += 1
+    
+    for (entry, _), count in zip(order, remaining):
+        if count:
+            unplaced.append((entry, count))
+    
+    return garden, failed_beds, unplaced
+
+def placement_report(garden, failed_beds, unplaced, elapsed=None):
+    #plain text summary of a batch plan
+    lines = []
+    total = sum(len(row.plant_ids) for bed in garden.beds for row in bed.rows_of_plants)
+    lines.append(f"Garden {garden.length}x{garden.width}: {len(garden.beds)} beds placed, "
+                 f"{len(failed_beds)} rejected, {total} plants placed, "
+                 f"{sum(count for _, count in unplaced)} not placed")
+    if elapsed is not None:
+        lines.append(f"Planned in {elapsed:.2f} s")
+    lines.append("")
+    lines.append("Beds:")
+    for bed in garden.beds:
+        count = sum(len(row.plant_ids) for row in bed.rows_of_plants)
+        lines.append(f"{bed.id}: at ({bed.x}, {bed.y}), {bed.length}x{bed.width}, "
+                     f"{count} plants, {bed.utilisation():.1%} used")
+    if failed_beds:
+        lines.append("")
+        lines.append("Beds not placed (out of bounds or overlapping):")
+        for entry in failed_beds:
+            lines.append(f"at ({entry['x']}, {entry['y']}), {entry['length']}x{entry['width']}")
+    if unplaced:
+        lines.append("")
+        lines.append("Plants not placed:")
+        for entry, count in unplaced:
+            lines.append(f"{count} x {entry['name']} ({entry['symbol']}, size {entry['size']})")
+    return "\n".join(lines) + "\n"
+
+def batch_main(argv=None):
+    
+    #Command line entry point: "python project_c.py batch --help"
+    
+    import argparse
+    
+    parser = argparse.ArgumentParser(prog="project_c.py batch",
+                                     description="Plan a garden from a JSON or CSV spec without the menu.")
+    parser.add_argument("spec", help="garden spec (.json, or .csv)")
+    parser.add_argument("--report", help="write the placement report here instead of printing it")
+    parser.add_argument("--render", help="also write the garden's grid to this file")
+    parser.add_argument("--save", help="also save the planned garden here, for Garden.load")
+    args = parser.parse_args(argv)
+    
+    spec = load_spec(args.spec)
+    start = time.perf_counter()
+    garden, failed_beds, unplaced = plan_garden(spec)
+    elapsed = time.perf_counter() - start
+    
+    report = placement_report(garden, failed_beds, unplaced, elapsed)
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            f.write(report)
+    else:
+        print(report, end="")
+    if args.render:
+        garden.save_render(args.render)
+    if args.save:
+        garden.save(args.save)
 
         
-if __name__ == "__main__":
+if __name__ == "__main__" and sys.argv[1:2] == ["batch"]:
+    #"python project_c.py batch spec.json" plans a garden without the menu
+    batch_main(sys.argv[2:])
+        
+elif __name__ == "__main__":
     
     print("Welcome to the Garden Planner")
     l = int(input("Please enter the length of the garden: "))
@@ -285,8 +1153,11 @@ if __name__ == "__main__":
             
             max_id = garden.next_bed_id
             print("Please choose from one of the following garden beds:")
-            for i in range(max_id):
-                print(i)
+            if max_id > 10:
+                print(garden.legend())
+            else:
+                for i in range(max_id):
+                    print(i)
             which = int(input())
             if which not in range(max_id):
                 print("Invalid choice")
@@ -301,4 +1172,19 @@ if __name__ == "__main__":
                     
         elif choice == "a":
             add_new_bed(garden)
+            
+        elif choice == "s":
+            path = input("Please enter the file to save the garden to: ")
+            garden.save(path)
+            print("Your garden has been saved")
+            
+        elif choice == "o":
+            path = input("Please enter the file of the saved garden: ")
+            try:
+                garden = Garden.load(path)
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+                print("Sorry, that file could not be opened as a saved garden")
+                continue
+            print("OK, here's your garden")
+            print(garden)
 